@@ -1,18 +1,81 @@
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request, Response, BackgroundTasks, UploadFile, File
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel, EmailStr
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, RedirectResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, EmailStr, Field
 from passlib.context import CryptContext
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
-import pymongo
+from datetime import datetime, timedelta, timezone, date
+from concurrent.futures import ThreadPoolExecutor
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse as StarletteFileResponse
+from starlette.staticfiles import NotModifiedResponse
+from starlette.routing import Match
 import os
-from typing import Optional, List
+import sys
+import asyncio
+from typing import Optional, List, Tuple, Dict, Set
 import uuid
-from bson import ObjectId
+import json
+import base64
+import time
+import hashlib
+import csv
+import io
+import tempfile
 import shutil
+import gzip
+import math
+import ipaddress
+from functools import lru_cache, partial
+from collections import OrderedDict, defaultdict
+from bson import ObjectId
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Optional: attachment thumbnails need Pillow, PDF previews also need pypdfium2
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+# Optional: XLSX export
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+# Optional: C JSON encoder for the listing fast path, brotli response compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+# Optional: Redis for state shared between workers
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
 import mimetypes
 
 # Environment variables
@@ -22,15 +85,527 @@ SECRET_KEY = "vb_solucoes_secret_key_2024"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Create uploads directory
+# Listing pagination; clients that don't pass `limit` get DEFAULT_PAGE_SIZE and an X-Next-Cursor
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Full-text search covers only the newest comments of each incident, keeping busy threads' documents small
+SEARCH_COMMENTS_LIMIT = 200
+
+# Password hashing pool: bcrypt runs on worker threads, excess requests get 503
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '64'))
+
+# Dashboard statistics: resolution-time histogram bucket upper bounds, in hours
+RESOLUTION_BUCKETS_HOURS = [1, 4, 8, 24, 48, 72, 168, 336, 720]
+RESOLVED_STATUS = "resolvida"
+
+# Background cleanup
+CASCADE_BATCH_SIZE = 500
+GC_INTERVAL_SECONDS = int(os.environ.get('GC_INTERVAL_SECONDS', '3600'))
+# Files younger than this are never collected, so in-flight uploads are safe
+GC_MIN_FILE_AGE_SECONDS = 3600
+# An upload of bytes whose last reference is being deleted waits for the delete to finish
+BLOB_ACQUIRE_RETRIES = 50
+BLOB_ACQUIRE_RETRY_SECONDS = 0.1
+
+# Bulk operations
+MAX_BULK_ITEMS = 1000
+# Plenty for MAX_BULK_ITEMS rows of hand-typed records
+MAX_IMPORT_SIZE = 4 * 1024 * 1024
+# Fixed namespace so re-importing the same paper record yields the same incident id
+IMPORT_NAMESPACE = uuid.UUID("5b0a8f1e-3c1d-4f7a-9b6e-2d4c8a1e7f30")
+IMPORT_REQUIRED_COLUMNS = ["title", "description", "type", "location", "people_involved", "severity"]
+
+# Occurrence book export
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = [
+    "id", "created_at", "updated_at", "resolved_at", "status", "severity", "type", "title", "description",
+    "location", "people_involved", "created_by_username", "comments_count", "files_count",
+]
+
+# Response encoding. FAST_JSON_RESPONSES=1 serializes listing pages straight
+# from Mongo documents with orjson, skipping Pydantic validation of each row.
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', '0') == '1' and orjson is not None
+# Smaller bodies aren't worth compressing
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+# Workers and the state they share. memory:// keeps everything in-process
+# (single worker only); redis://host:6379/0 shares it across workers and hosts;
+# fakeredis:// runs the Redis code path against an in-process stand-in
+# (from requirements-dev.txt).
+SHARED_STATE_URL = os.environ.get('SHARED_STATE_URL', 'memory://')
+SHARED_STATE_PREFIX = os.environ.get('SHARED_STATE_PREFIX', 'vb:')
+# Worker processes for `python server.py`; "auto" means one per core
+WEB_CONCURRENCY = os.environ.get('WEB_CONCURRENCY', '1')
+# Token buckets the in-memory backend keeps before evicting the least recent
+MAX_MEMORY_BUCKETS = 100000
+
+# Rate limiting: token buckets as (tokens per second, burst). Authenticated
+# requests are keyed on the user, anonymous ones on the client IP.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMITS = {
+    "auth": (30 / 60, 30),
+    "upload": (1.0, 20),
+    "read": (20.0, 100),
+    "write": (5.0, 30),
+}
+# Failed login/register attempts per target username from one client, on top of the per-IP auth
+# budget. Only failures are charged, and per client, so nobody can lock a user out from elsewhere.
+USERNAME_RATE_LIMIT = (5 / 60, 5)
+RATE_LIMIT_ROUTES = {
+    ("POST", "/api/login"): "auth",
+    ("POST", "/api/register"): "auth",
+    ("PUT", "/api/change-password"): "auth",
+    ("POST", "/api/incidents/{incident_id}/files"): "upload",
+    ("POST", "/api/incidents/bulk/import"): "upload",
+}
+# Attachments are immutable, cacheable and fetched in bursts by the thumbnail grid
+RATE_LIMIT_EXEMPT_ROUTES = ("/api/health", "/api/metrics", "/uploads", "/uploads/{key:path}")
+# Peers whose X-Forwarded-For is believed (the ingress); the client IP is the nearest hop outside
+# them. Defaults to loopback and private networks; set it empty when clients connect directly.
+RATE_LIMIT_TRUSTED_PROXIES = [
+    ipaddress.ip_network(network.strip())
+    for network in os.environ.get(
+        'RATE_LIMIT_TRUSTED_PROXIES', '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7'
+    ).split(',')
+    if network.strip()
+]
+
+# Server-sent events
+EVENT_QUEUE_SIZE = 100
+EVENT_HEARTBEAT_SECONDS = 15
+
+# Authenticated user cache
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '60'))
+USER_CACHE_MAX_SIZE = int(os.environ.get('USER_CACHE_MAX_SIZE', '1024'))
+
+# MongoDB connection pool settings
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '200'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '10000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '5000'))
+
+# Attachment storage: "local" keeps blobs under UPLOAD_DIR and serves them at /uploads,
+# "s3" keeps them in an S3-compatible bucket (AWS, MinIO, ...) and hands out presigned URLs
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
 UPLOAD_DIR = "/app/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+S3_BUCKET = os.environ.get('S3_BUCKET', '')
+S3_PREFIX = os.environ.get('S3_PREFIX', 'uploads/')
+S3_ENDPOINT_URL = os.environ.get('S3_ENDPOINT_URL') or None
+# Host browsers reach the bucket on, when it differs from the one the API talks to (e.g. MinIO in docker)
+S3_PUBLIC_ENDPOINT_URL = os.environ.get('S3_PUBLIC_ENDPOINT_URL') or None
+S3_URL_TTL_SECONDS = int(os.environ.get('S3_URL_TTL_SECONDS', '3600'))
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+# Where uploads are spooled until their hash is known when the blobs live in a bucket
+STORAGE_SPOOL_DIR = os.environ.get('STORAGE_SPOOL_DIR', tempfile.gettempdir())
+
+# Filesystem calls on the upload/file path run on their own bounded pool
+FILE_IO_WORKERS = int(os.environ.get('FILE_IO_WORKERS', '8'))
+FILE_IO_CHUNK_SIZE = 256 * 1024
+# Behind nginx, set to an `internal` location aliasing UPLOAD_DIR (e.g. /protected-uploads/)
+# and /uploads answers with X-Accel-Redirect so nginx sendfile()s the bytes itself
+UPLOADS_ACCEL_REDIRECT = os.environ.get('UPLOADS_ACCEL_REDIRECT', '')
+
+# Attachment thumbnails (longest side, in pixels)
+THUMBNAIL_SIZES = [160, 480, 1024]
+# Larger sources (after JPEG draft downscaling) get no thumbnail rather than a decompression bomb
+MAX_THUMBNAIL_SOURCE_PIXELS = 40_000_000
+
+# Upload limits
+MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+MAX_FILES_PER_INCIDENT = 10
+ALLOWED_FILE_TYPES = [".jpg", ".jpeg", ".png", ".pdf"]
+# Leading bytes of each accepted format and the extensions they may carry
+FILE_SIGNATURES = [
+    (b"\xff\xd8\xff", (".jpg", ".jpeg")),
+    (b"\x89PNG\r\n\x1a\n", (".png",)),
+    (b"%PDF-", (".pdf",)),
+]
+
+# Metrics, exposed at /api/metrics
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests served", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "Time until the last response byte is sent", ["method", "route"])
+# Gauges sum across workers when PROMETHEUS_MULTIPROC_DIR is set (multi-worker mode)
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "Requests currently being served", ["method", "route"], multiprocess_mode="livesum")
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds",
+    "MongoDB command round-trip time",
+    ["collection", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+MONGO_FAILURES = Counter("mongo_command_failures_total", "MongoDB commands that returned an error", ["collection", "command"])
+PASSWORD_HASH_LATENCY = Histogram("password_hash_duration_seconds", "bcrypt time on the hashing pool", ["operation"])
+PASSWORD_HASH_PENDING = Gauge("password_hash_pending", "bcrypt calls running or queued on the hashing pool", multiprocess_mode="livesum")
+UPLOAD_BYTES = Counter("upload_bytes_total", "Request body bytes received by the upload endpoint")
+RATE_LIMITED = Counter("rate_limited_requests_total", "Requests rejected with 429", ["bucket", "key"])
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command, labelled by collection and command name"""
+
+    def __init__(self):
+        self.collections = {}
+
+    def started(self, event):
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        self.collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event):
+        collection = self.collections.pop((event.connection_id, event.request_id), "")
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self.collections.pop((event.connection_id, event.request_id), "")
+        MONGO_LATENCY.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+        MONGO_FAILURES.labels(collection, event.command_name).inc()
+
+class MetricsMiddleware:
+    """ASGI middleware recording count, latency and in-flight requests per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = HTTP_IN_PROGRESS.labels(method, route)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.labels(method, route).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            in_progress.dec()
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete text responses with brotli or gzip.
+
+    Streaming responses (SSE, exports) pass through untouched so nothing is
+    held back in a compressor buffer.
+    """
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+
+        async def send_wrapper(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows whether the body is complete
+                start_message = message
+                return
+            if start_message is not None and message["type"] != "http.response.body":
+                # pathsend/zerocopysend file responses carry no body to compress
+                start, start_message = start_message, None
+                await send(start)
+            if message["type"] == "http.response.body" and start_message is not None:
+                start, start_message = start_message, None
+                headers = MutableHeaders(raw=start["headers"])
+                if headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                    headers.add_vary_header("Accept-Encoding")
+                    body = message.get("body", b"")
+                    if not message.get("more_body", False) and len(body) >= self.minimum_size and "content-encoding" not in headers:
+                        body = compress_body(body, encoding)
+                        headers["Content-Encoding"] = encoding
+                        headers["Content-Length"] = str(len(body))
+                        message = {"type": "http.response.body", "body": body}
+                await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported coding in an Accept-Encoding header, ignoring q=0 entries"""
+    offered = set()
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        offered.add(coding.strip())
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class RateLimitMiddleware:
+    """ASGI middleware spending a token per request before any Mongo or bcrypt work.
+
+    Buckets live in shared_state, so the budgets hold across workers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+        route = route_template(scope)
+        if route in RATE_LIMIT_EXEMPT_ROUTES:
+            return await self.app(scope, receive, send)
+
+        method = "GET" if scope["method"] == "HEAD" else scope["method"]
+        bucket = RATE_LIMIT_ROUTES.get((method, route), "read" if method == "GET" else "write")
+        rate, burst = RATE_LIMITS[bucket]
+        headers = Headers(scope=scope)
+        user_id = token_subject(headers.get("authorization", ""))
+        if user_id:
+            key = "user"
+            wait = await take_token(f"{bucket}:user:{user_id}", rate, burst)
+        else:
+            key = "ip"
+            wait = await take_token(f"{bucket}:ip:{client_ip(scope, headers)}", rate, burst)
+
+        if not wait and route in ("/api/login", "/api/register"):
+            # The body has to be read here to find the username; replay it to the route afterwards
+            body = await read_body(receive)
+            receive = replay_body(body, receive)
+            username = body_username(body)
+            if username:
+                key = "username"
+                username_key = f"auth:username:{username}:{client_ip(scope, headers)}"
+                # Only check the budget now; a token is spent once the attempt has failed
+                wait = await take_token(username_key, *USERNAME_RATE_LIMIT, cost=0)
+                send = charge_on_failure(send, username_key, USERNAME_RATE_LIMIT)
+
+        if wait:
+            RATE_LIMITED.labels(bucket, key).inc()
+            response = JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Too many requests, please try again later"},
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+            return await response(scope, receive, send)
+        await self.app(scope, receive, send)
+
+def token_subject(authorization: str) -> Optional[str]:
+    """Username in a valid bearer token, without touching the database"""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+async def take_token(key: str, rate: float, burst: int, cost: int = 1) -> float:
+    """shared_state.take_token, failing open: an unreachable Redis must not take the API down with it"""
+    try:
+        return await shared_state.take_token(key, rate, burst, cost)
+    except Exception as e:
+        print(f"Rate limit check for {key} failed, allowing the request: {e}")
+        return 0.0
+
+def charge_on_failure(send, key: str, limit: Tuple[float, int]):
+    """Wrap `send` to spend a token from `key` when the request is refused (other than by the limiter)"""
+
+    async def charging_send(message):
+        if message["type"] == "http.response.start" and 400 <= message["status"] < 500 and message["status"] != 429:
+            await take_token(key, *limit)
+        await send(message)
+
+    return charging_send
+
+def trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in RATE_LIMIT_TRUSTED_PROXIES)
+
+def client_ip(scope, headers: Headers) -> str:
+    """Peer address, or the nearest X-Forwarded-For hop that is not a trusted proxy"""
+    address = scope["client"][0] if scope.get("client") else "unknown"
+    if trusted_proxy(address) and "x-forwarded-for" in headers:
+        # Proxies append, so only the hops right of the last untrusted one can be believed
+        for hop in reversed(headers["x-forwarded-for"].split(",")):
+            address = hop.strip()
+            if not trusted_proxy(address):
+                break
+    return address
+
+async def read_body(receive) -> bytes:
+    body = b""
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    return body
+
+def replay_body(body: bytes, receive):
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if sent:
+            return await receive()
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return replay
+
+def body_username(body: bytes) -> Optional[str]:
+    try:
+        username = json.loads(body).get("username")
+    except (ValueError, AttributeError):
+        return None
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+def route_template(scope) -> str:
+    """Path template of the route that will serve `scope`; ids stay out of metric labels"""
+    if "route_template" not in scope:
+        scope["route_template"] = "unmatched"
+        for route in app.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                scope["route_template"] = route.path
+                break
+    return scope["route_template"]
 
 # FastAPI app
 app = FastAPI(title="VB Soluções - Livro de Ocorrência Online")
 
 # Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
+class RangeFileResponse(StarletteFileResponse):
+    """
+    FileResponse serving an optional single byte range. The body goes through the
+    server's zero-copy send when it offers one, otherwise it is read on the file I/O pool.
+    """
+
+    def __init__(self, *args, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.headers["Accept-Ranges"] = "bytes"
+        self.byte_range = byte_range
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = status.HTTP_206_PARTIAL_CONTENT
+            self.headers["Content-Range"] = f"bytes {start}-{end}/{self.stat_result.st_size}"
+            self.headers["Content-Length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send):
+        start, end = self.byte_range or (0, self.stat_result.st_size - 1)
+        extensions = scope.get("extensions", {})
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.zerocopysend" in extensions:
+            f = await file_io.open(self.path, "rb")
+            try:
+                await send({"type": "http.response.zerocopysend", "file": f, "offset": start, "count": end - start + 1})
+            finally:
+                await file_io.run(f.close)
+        elif "http.response.pathsend" in extensions and self.byte_range is None:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            f = await file_io.open(self.path, "rb")
+            try:
+                await file_io.run(f.seek, start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = await file_io.run(f.read, min(FILE_IO_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0 or end < start:
+                    await send({"type": "http.response.body", "body": b""})
+            finally:
+                await file_io.run(f.close)
+        if self.background is not None:
+            await self.background()
+
+def parse_byte_range(header: str, size: int):
+    """(start, end) for a single `bytes=` range, False if unsatisfiable, None to serve the whole file"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Multiple ranges are legal to ignore; the full body is a valid answer
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return False
+    return start, min(end, size - 1)
+
+class ImmutableStaticFiles(StaticFiles):
+    """Upload URLs are content-addressed (or uuid-prefixed), so their bytes never change"""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        response = RangeFileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        if status_code != 200:
+            return response
+
+        if UPLOADS_ACCEL_REDIRECT:
+            # nginx handles Range and conditional requests on the redirected location
+            location = UPLOADS_ACCEL_REDIRECT.rstrip("/") + "/" + os.path.relpath(full_path, UPLOAD_DIR)
+            return Response(headers={
+                "X-Accel-Redirect": location,
+                "Content-Type": response.media_type,
+                "Cache-Control": response.headers["Cache-Control"],
+            })
+
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and if_range in (None, response.headers["etag"], response.headers["last-modified"]):
+            byte_range = parse_byte_range(range_header, stat_result.st_size)
+            if byte_range is False:
+                return Response(
+                    status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                    headers={"Content-Range": f"bytes */{stat_result.st_size}"},
+                )
+            if byte_range is not None:
+                ranged = RangeFileResponse(full_path, stat_result=stat_result, byte_range=byte_range)
+                ranged.headers["Cache-Control"] = response.headers["Cache-Control"]
+                return ranged
+        return response
+
+# Innermost, so 429s still get CORS headers and show up in metrics
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
 
 # CORS
 app.add_middleware(
@@ -39,25 +614,823 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+app.add_middleware(MetricsMiddleware)
 
-# MongoDB connection
-client = pymongo.MongoClient(MONGO_URL)
+# MongoDB connection (async, non-blocking)
+client = AsyncIOMotorClient(
+    MONGO_URL,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+    socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    event_listeners=[MongoCommandMetrics()],
+)
 db = client[DB_NAME]
 users_collection = db.users
 incidents_collection = db.incidents
 comments_collection = db.comments
 files_collection = db.files
+blobs_collection = db.blobs
+read_markers_collection = db.read_markers
+stats_collection = db.stats
 
-# Create uploads directory
-UPLOAD_DIR = "/app/uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+# Indexes backing every route filter and sort; provisioned idempotently at startup
+MONGO_INDEXES = [
+    (users_collection, [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ]),
+    (incidents_collection, [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+        IndexModel([("created_by", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="created_by_created_at_id"),
+        IndexModel(
+            [("created_by", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="created_by_status_created_at_id",
+        ),
+        # Rows tagged by an in-flight bulk delete
+        IndexModel([("deleting_by", ASCENDING)], name="deleting_by", sparse=True),
+        # Text index v3 is diacritic-insensitive ("agua" matches "água") and stems Portuguese
+        IndexModel(
+            [("title", TEXT), ("description", TEXT), ("location", TEXT), ("people_involved", TEXT), ("search_comments", TEXT)],
+            name="incident_text",
+            default_language="portuguese",
+            language_override="search_language",
+            weights={"title": 10, "description": 5, "location": 3, "people_involved": 3, "search_comments": 1},
+        ),
+    ]),
+    (comments_collection, [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("incident_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], name="incident_id_created_at_id"),
+    ]),
+    (files_collection, [
+        IndexModel([("id", ASCENDING)], unique=True, name="id_unique"),
+        IndexModel([("incident_id", ASCENDING), ("upload_date", DESCENDING), ("id", DESCENDING)], name="incident_id_upload_date_id"),
+        IndexModel([("sha256", ASCENDING)], name="sha256"),
+    ]),
+    (read_markers_collection, [
+        IndexModel([("user_id", ASCENDING), ("incident_id", ASCENDING)], unique=True, name="user_id_incident_id"),
+        IndexModel([("incident_id", ASCENDING)], name="incident_id"),
+    ]),
+    (blobs_collection, [
+        # Only unreferenced blobs, which the garbage collector looks for
+        IndexModel(
+            [("refcount", ASCENDING)],
+            name="refcount_unreferenced",
+            partialFilterExpression={"refcount": {"$lte": 0}},
+        ),
+    ]),
+]
+
+async def ensure_indexes():
+    """Create missing indexes; existing ones with the same spec are left untouched"""
+    for collection, indexes in MONGO_INDEXES:
+        try:
+            await collection.create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. duplicate usernames in legacy data block a unique index
+            print(f"Could not create indexes on {collection.name}: {e}")
+
+# Representative (collection, filter, sort) for each route query, checked by verify_query_plans
+ROUTE_QUERIES = [
+    ("get_current_user", users_collection, {"username": "admin"}, None),
+    ("change_password", users_collection, {"id": "x"}, None),
+    ("register", users_collection, {"$or": [{"username": "x"}, {"email": "x@x.com"}]}, None),
+    ("get_incident", incidents_collection, {"id": "x"}, None),
+    ("get_incidents admin", incidents_collection, {}, [("created_at", -1), ("id", -1)]),
+    ("get_incidents admin status", incidents_collection, {"status": "nova"}, [("created_at", -1), ("id", -1)]),
+    ("get_incidents user", incidents_collection, {"created_by": "x"}, [("created_at", -1), ("id", -1)]),
+    ("get_incidents user status", incidents_collection, {"created_by": "x", "status": "nova"}, [("created_at", -1), ("id", -1)]),
+    ("search_incidents", incidents_collection, {"created_by": "x", "$text": {"$search": "agua"}}, None),
+    ("get_comments", comments_collection, {"incident_id": "x"}, [("created_at", 1), ("id", 1)]),
+    ("count comments", comments_collection, {"incident_id": "x"}, None),
+    ("get_files", files_collection, {"incident_id": "x"}, [("upload_date", -1), ("id", -1)]),
+    ("delete_file", files_collection, {"id": "x"}, None),
+    ("set_thumbnails", files_collection, {"sha256": "x"}, None),
+    ("collect_garbage legacy files", files_collection, {"sha256": {"$exists": False}}, None),
+    ("mark_read", read_markers_collection, {"user_id": "x", "incident_id": "x"}, None),
+    ("last_read", read_markers_collection, {"user_id": "x", "incident_id": {"$in": ["x", "y"]}}, None),
+    ("delete_incident_children read markers", read_markers_collection, {"incident_id": "x"}, None),
+    ("store_blob", blobs_collection, {"_id": "x", "deleting_at": {"$exists": False}}, None),
+    ("collect_garbage blobs", blobs_collection, {"refcount": {"$lte": 0}}, None),
+]
+
+def find_plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += find_plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += find_plan_stages(child)
+    return stages
+
+async def verify_query_plans() -> bool:
+    """Run explain() on every route query and report any that fall back to COLLSCAN"""
+    await ensure_indexes()
+    ok = True
+    for name, collection, query, sort in ROUTE_QUERIES:
+        cursor = collection.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+        stages = find_plan_stages(plan)
+        if "COLLSCAN" in stages:
+            ok = False
+            print(f"❌ {name}: COLLSCAN on {collection.name}")
+        else:
+            print(f"✅ {name}: {' <- '.join(stage for stage in stages if stage)}")
+    return ok
+
+# Repository layer
+class MongoRepository:
+    """Async data access for one collection, keyed by the public `id` field"""
+
+    # Internal fields never returned by get() or list reads
+    hidden_fields = ()
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @property
+    def default_projection(self) -> Optional[dict]:
+        return {field: 0 for field in self.hidden_fields} or None
+
+    async def get(self, doc_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": doc_id}, self.default_projection)
+
+    async def find_one(self, query: dict) -> Optional[dict]:
+        return await self.collection.find_one(query)
+
+    async def find(self, query: dict, sort: Optional[list] = None, limit: int = 0) -> List[dict]:
+        cursor = self.collection.find(query, self.default_projection)
+        if sort:
+            cursor = cursor.sort(sort)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def insert(self, document: dict) -> dict:
+        await self.collection.insert_one(document)
+        return document
+
+    def writable(self, doc_id: str) -> dict:
+        """Filter for the document single-row writes may change"""
+        return {"id": doc_id}
+
+    async def update(self, doc_id: str, fields: dict) -> bool:
+        result = await self.collection.update_one(self.writable(doc_id), {"$set": fields})
+        return result.matched_count > 0
+
+    async def update_and_get(self, doc_id: str, fields: dict, before: bool = False) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            self.writable(doc_id),
+            {"$set": fields},
+            projection=self.default_projection,
+            return_document=ReturnDocument.BEFORE if before else ReturnDocument.AFTER,
+        )
+
+    async def delete(self, doc_id: str) -> bool:
+        result = await self.collection.delete_one(self.writable(doc_id))
+        return result.deleted_count > 0
+
+    async def delete_and_get(self, doc_id: str) -> Optional[dict]:
+        return await self.collection.find_one_and_delete(self.writable(doc_id), projection=self.default_projection)
+
+    async def count(self, query: dict) -> int:
+        return await self.collection.count_documents(query)
+
+    async def find_page(
+        self,
+        query: dict,
+        sort_field: str,
+        descending: bool,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Keyset pagination on (sort_field, id); returns the page and the cursor for the next one"""
+        direction = -1 if descending else 1
+        if cursor:
+            last_value, last_id = decode_cursor(cursor)
+            op = "$lt" if descending else "$gt"
+            query = {"$and": [query, {"$or": [
+                {sort_field: {op: last_value}},
+                {sort_field: last_value, "id": {op: last_id}},
+            ]}]}
+
+        projection = self.default_projection
+        if fields:
+            projection = {field: 1 for field in fields}
+            projection.update({"_id": 0, "id": 1, sort_field: 1})
+
+        find = self.collection.find(query, projection).sort([(sort_field, direction), ("id", direction)])
+        if limit:
+            find = find.limit(limit + 1)
+        documents = await find.to_list(length=None)
+
+        next_cursor = None
+        if limit and len(documents) > limit:
+            documents = documents[:limit]
+            next_cursor = encode_cursor(documents[-1][sort_field], documents[-1]["id"])
+        # The sort field was only read to build the cursor; `id` always identifies the row
+        if fields and sort_field not in fields:
+            for document in documents:
+                document.pop(sort_field, None)
+        return documents, next_cursor
+
+def encode_cursor(value: datetime, doc_id: str) -> str:
+    raw = json.dumps({"v": value.isoformat(), "id": doc_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["v"]), str(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def encode_offset_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return max(0, int(json.loads(raw)["o"]))
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    """Validate a comma-separated `fields=` projection against a response model"""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return requested
+
+def listing_etag(*parts) -> str:
+    """Weak validator for a listing, built from the versions of what it contains"""
+    return 'W/"' + hashlib.sha1(repr(parts).encode()).hexdigest() + '"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 response when the client already holds `etag`, before any body is built"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    if "*" in candidates or etag in candidates or etag[2:] in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    return None
+
+def page_response(
+    documents: List[dict],
+    model,
+    fields: Optional[List[str]],
+    response: Response,
+    next_cursor: Optional[str],
+    etag: Optional[str] = None,
+):
+    headers = {"Cache-Control": "private, no-cache"}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if etag:
+        headers["ETag"] = etag
+    if fields is None:
+        if FAST_JSON_RESPONSES:
+            defaults = model_defaults(model)
+            rows = [{name: document.get(name, default) for name, default in defaults.items()} for document in documents]
+            return ORJSONResponse(content=rows, headers=headers)
+        response.headers.update(headers)
+        return [model(**document) for document in documents]
+    # Partial documents don't satisfy the response model, return them as-is
+    if FAST_JSON_RESPONSES:
+        return ORJSONResponse(content=documents, headers=headers)
+    return JSONResponse(content=jsonable_encoder(documents), headers=headers)
+
+@lru_cache(maxsize=None)
+def model_defaults(model) -> Dict[str, object]:
+    """Field name -> default for shaping raw documents the way `model` would serialize them"""
+    return {
+        name: None if info.is_required() else info.get_default(call_default_factory=True)
+        for name, info in model.model_fields.items()
+    }
+
+class UserRepository(MongoRepository):
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        return await self.find_one({"username": username})
+
+    async def get_by_username_or_email(self, username: str, email: str) -> Optional[dict]:
+        return await self.find_one({"$or": [{"username": username}, {"email": email}]})
+
+    async def update(self, doc_id: str, fields: dict) -> bool:
+        # Password or role changes must not be served from a stale cached User,
+        # here or in any other worker
+        user_cache.invalidate_matching(lambda cached: cached.id == doc_id)
+        updated = await super().update(doc_id, fields)
+        shared_state.publish("user-cache", {"user_id": doc_id})
+        return updated
+
+class IncidentRepository(MongoRepository):
+    # Comment messages copied onto the incident so one text index covers them
+    hidden_fields = ("search_comments",)
+
+    def writable(self, doc_id: str) -> dict:
+        # Rows tagged by a bulk delete are frozen, so the state it subtracts from the rollup is final
+        return {"id": doc_id, "deleting_by": {"$exists": False}}
+
+    async def list_visible(self, query: dict, **page) -> Tuple[List[dict], Optional[str]]:
+        return await self.find_page(query, "created_at", descending=True, **page)
+
+    async def record_comment(self, incident_id: str, message: str, now: datetime) -> Optional[int]:
+        """Bump comments_count in place and return the new value"""
+        incident = await self.collection.find_one_and_update(
+            {"id": incident_id},
+            {
+                "$inc": {"comments_count": 1},
+                "$set": {"last_comment_at": now, "updated_at": now},
+                "$push": {"search_comments": {"$each": [message], "$slice": -SEARCH_COMMENTS_LIMIT}},
+            },
+            projection={"comments_count": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return incident["comments_count"] if incident else None
+
+    async def reserve_file_slot(self, incident_id: str, limit: int) -> Optional[int]:
+        """Claim one file slot if the incident is under `limit`; returns the new files_count"""
+        incident = await self.collection.find_one_and_update(
+            # $not also matches incidents that have never had files_count written
+            {"id": incident_id, "files_count": {"$not": {"$gte": limit}}},
+            {"$inc": {"files_count": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            projection={"files_count": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return incident["files_count"] if incident else None
+
+    async def release_file_slot(self, incident_id: str):
+        await self.collection.update_one(
+            {"id": incident_id},
+            {"$inc": {"files_count": -1}, "$set": {"updated_at": datetime.utcnow()}},
+        )
+
+    async def set_status_unchanged(self, incidents: List[dict], changes: dict) -> Set[str]:
+        """
+        Apply a status change with one bulk_write, each update guarded on the status that was
+        read so the stats rollup stays exact under races; returns the ids actually updated
+        """
+        ids = [incident["id"] for incident in incidents]
+        result = await self.collection.bulk_write(
+            [
+                UpdateOne({**self.writable(incident["id"]), "status": incident["status"]}, {"$set": changes})
+                for incident in incidents
+            ],
+            ordered=False,
+        )
+        if result.modified_count == len(ids):
+            return set(ids)
+        confirmed = await self.collection.find(
+            {"id": {"$in": ids}, "status": changes["status"], "updated_at": changes["updated_at"]}, {"id": 1}
+        ).to_list(length=None)
+        return {doc["id"] for doc in confirmed}
+
+    async def delete_unchanged(self, incidents: List[dict]) -> List[dict]:
+        """
+        Delete the incidents whose status is still the one read and return exactly the documents
+        this call deleted. Rows are tagged with a per-call token first; tagged rows are frozen
+        against other writes (see writable), so what is read back is what gets deleted.
+        """
+        token = str(uuid.uuid4())
+        ids_by_status = defaultdict(list)
+        for incident in incidents:
+            ids_by_status[incident["status"]].append(incident["id"])
+        for read_status, ids in ids_by_status.items():
+            await self.collection.update_many(
+                {"id": {"$in": ids}, "status": read_status, "deleting_by": {"$exists": False}},
+                {"$set": {"deleting_by": token}},
+            )
+        tagged = await self.collection.find({"deleting_by": token}, self.default_projection).to_list(length=None)
+        await self.collection.delete_many({"deleting_by": token})
+        return tagged
+
+    async def insert_missing(self, incidents: List[dict]) -> Set[int]:
+        """Upsert by id with one bulk_write, leaving existing incidents alone; returns the indexes inserted"""
+        result = await self.collection.bulk_write(
+            [UpdateOne({"id": incident["id"]}, {"$setOnInsert": incident}, upsert=True) for incident in incidents],
+            ordered=False,
+        )
+        return set(result.upserted_ids)
+
+    def stream(self, query: dict, fields: List[str]):
+        """Server-side cursor in creation order, fetched in EXPORT_BATCH_SIZE batches"""
+        projection = {"_id": 0, **{field: 1 for field in fields}}
+        return self.collection.find(query, projection).sort([("created_at", ASCENDING), ("id", ASCENDING)]).batch_size(EXPORT_BATCH_SIZE)
+
+    async def search(self, query: dict, text: str, limit: int, offset: int) -> List[dict]:
+        """Text search ranked by relevance, newest first among equal scores"""
+        projection = {"score": {"$meta": "textScore"}, **self.default_projection}
+        cursor = self.collection.find({"$and": [query, {"$text": {"$search": text}}]}, projection)
+        cursor = cursor.sort([("score", {"$meta": "textScore"}), ("created_at", DESCENDING)])
+        return await cursor.skip(offset).limit(limit).to_list(length=None)
+
+class CommentRepository(MongoRepository):
+    async def list_for_incident(self, incident_id: str, **page) -> Tuple[List[dict], Optional[str]]:
+        return await self.find_page({"incident_id": incident_id}, "created_at", descending=False, **page)
+
+class FileRepository(MongoRepository):
+    async def list_for_incident(self, incident_id: str, **page) -> Tuple[List[dict], Optional[str]]:
+        return await self.find_page({"incident_id": incident_id}, "upload_date", descending=True, **page)
+
+    async def set_thumbnails(self, sha256: str, thumbnails: Dict[str, str]):
+        await self.collection.update_many({"sha256": sha256}, {"$set": {"thumbnails": thumbnails}})
+
+class BlobRepository(MongoRepository):
+    """
+    Reference counts for content-addressed upload blobs; `_id` is the SHA-256 of the bytes.
+
+    Unreferenced blobs are claimed for deletion (`deleting_at`) before their bytes go,
+    and the row is only removed afterwards, so a new upload of the same bytes can never
+    attach to a blob whose bytes are being deleted.
+    """
+
+    async def acquire(self, sha256: str, filename: str, size: int) -> dict:
+        for _ in range(BLOB_ACQUIRE_RETRIES):
+            try:
+                return await self.collection.find_one_and_update(
+                    {"_id": sha256, "deleting_at": {"$exists": False}},
+                    {
+                        "$inc": {"refcount": 1},
+                        "$setOnInsert": {"filename": filename, "size": size, "created_at": datetime.utcnow()},
+                    },
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+            except DuplicateKeyError:
+                # The row exists but is being deleted
+                await asyncio.sleep(BLOB_ACQUIRE_RETRY_SECONDS)
+        raise RuntimeError(f"Blob {sha256} is stuck in deletion")
+
+    async def release(self, sha256: str) -> Optional[dict]:
+        """Drop one reference; returns the blob, claimed for deletion, once nothing references it any more"""
+        blob = await self.collection.find_one_and_update(
+            {"_id": sha256},
+            {"$inc": {"refcount": -1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if blob is None or blob["refcount"] > 0:
+            return None
+        return await self.claim_deletion(sha256)
+
+    async def claim_deletion(self, sha256: str, stale_before: Optional[datetime] = None) -> Optional[dict]:
+        """Mark an unreferenced blob as being deleted; claims older than `stale_before` can be taken over"""
+        query = {"_id": sha256, "refcount": {"$lte": 0}, "deleting_at": {"$exists": False}}
+        if stale_before is not None:
+            del query["deleting_at"]
+            query["$or"] = [{"deleting_at": {"$exists": False}}, {"deleting_at": {"$lt": stale_before}}]
+        return await self.collection.find_one_and_update(
+            query,
+            {"$set": {"deleting_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def forget(self, blob: dict):
+        """Remove a claimed blob's row once its bytes are gone"""
+        await self.collection.delete_one({"_id": blob["_id"], "deleting_at": blob["deleting_at"]})
+
+class ReadMarkerRepository(MongoRepository):
+    """When each user last read each incident's comment thread"""
+
+    async def mark_read(self, user_id: str, incident_id: str, read_at: datetime):
+        await self.collection.update_one(
+            {"user_id": user_id, "incident_id": incident_id},
+            {"$max": {"last_read_at": read_at}},
+            upsert=True,
+        )
+
+    async def last_read(self, user_id: str, incident_ids: List[str]) -> Dict[str, datetime]:
+        """Markers for a whole listing page in one query"""
+        markers = await self.collection.find(
+            {"user_id": user_id, "incident_id": {"$in": incident_ids}},
+            {"_id": 0, "incident_id": 1, "last_read_at": 1},
+        ).to_list(length=None)
+        return {marker["incident_id"]: marker["last_read_at"] for marker in markers}
+
+def stat_key(value) -> str:
+    """Field-name-safe key for a user-entered value (Mongo paths can't contain '.' or start with '$')"""
+    key = str(value or "").strip().replace(".", "_").lstrip("$")
+    return key or "(vazio)"
+
+def resolution_bucket(incident: dict) -> str:
+    hours = (incident["resolved_at"] - incident["created_at"]).total_seconds() / 3600
+    for bound in RESOLUTION_BUCKETS_HOURS:
+        if hours <= bound:
+            return str(bound)
+    return "inf"
+
+def rollup_contribution(incident: Optional[dict]) -> Dict[str, int]:
+    """Counters one incident adds to the statistics rollup"""
+    if incident is None:
+        return {}
+    contribution = {
+        "total": 1,
+        f"by_status.{stat_key(incident['status'])}": 1,
+        f"by_severity.{stat_key(incident['severity'])}": 1,
+        f"by_type.{stat_key(incident['type'])}": 1,
+        f"by_bloco.{stat_key(incident['people_involved'])}": 1,
+        f"daily.{incident['created_at']:%Y-%m-%d}": 1,
+    }
+    if incident["status"] == RESOLVED_STATUS and incident.get("resolved_at"):
+        contribution[f"resolution_hours.{resolution_bucket(incident)}"] = 1
+    return contribution
+
+class StatsRepository(MongoRepository):
+    """Single materialized rollup document, maintained with \$inc on every incident write"""
+
+    ROLLUP_ID = "incidents"
+
+    async def apply(self, before: Optional[dict], after: Optional[dict]):
+        """Move an incident's contribution from its `before` to its `after` state (None = absent)"""
+        await self.apply_many([(before, after)])
+
+    async def apply_many(self, changes: List[Tuple[Optional[dict], Optional[dict]]]):
+        """Apply several (before, after) transitions with a single \$inc"""
+        delta = defaultdict(int)
+        for before, after in changes:
+            for path, count in rollup_contribution(after).items():
+                delta[path] += count
+            for path, count in rollup_contribution(before).items():
+                delta[path] -= count
+        delta = {path: count for path, count in delta.items() if count}
+        if delta:
+            await self.collection.update_one({"_id": self.ROLLUP_ID}, {"$inc": delta}, upsert=True)
+
+    async def get_rollup(self) -> dict:
+        return await self.collection.find_one({"_id": self.ROLLUP_ID}) or {}
+
+    async def replace_rollup(self, rollup: dict):
+        await self.collection.replace_one({"_id": self.ROLLUP_ID}, {"_id": self.ROLLUP_ID, **rollup}, upsert=True)
+
+users_repo = UserRepository(users_collection)
+incidents_repo = IncidentRepository(incidents_collection)
+comments_repo = CommentRepository(comments_collection)
+files_repo = FileRepository(files_collection)
+blobs_repo = BlobRepository(blobs_collection)
+read_markers_repo = ReadMarkerRepository(read_markers_collection)
+stats_repo = StatsRepository(stats_collection)
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+class PasswordHashPool:
+    """Bounded thread pool for bcrypt so hashing never blocks the event loop"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.capacity = workers + queue_limit
+        self.pending = 0
+
+    async def run(self, func, *args):
+        if self.pending >= self.capacity:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please try again",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        PASSWORD_HASH_PENDING.inc()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.timed, func, *args)
+        finally:
+            self.pending -= 1
+            PASSWORD_HASH_PENDING.dec()
+
+    @staticmethod
+    def timed(func, *args):
+        # Measured on the worker thread, so queueing time is not counted as bcrypt time
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            PASSWORD_HASH_LATENCY.labels(func.__name__).observe(time.perf_counter() - start)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
 # Security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+    def invalidate_matching(self, predicate):
+        for key in [key for key, (_, value) in self.entries.items() if predicate(value)]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+# Resolved User objects keyed by JWT subject (username)
+user_cache = TTLCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+def invalidate_cached_user(message: dict):
+    user_cache.invalidate_matching(lambda cached: cached.id == message["user_id"])
+
+# Cross-worker coordination
+class MemorySharedState:
+    """Default backend: messages, token buckets and locks stay inside this worker"""
+
+    def __init__(self):
+        self.handlers = {}
+        self.buckets = OrderedDict()
+        self.locks = {}
+
+    def subscribe(self, channel: str, handler):
+        self.handlers[channel] = handler
+
+    def publish(self, channel: str, message: dict):
+        handler = self.handlers.get(channel)
+        if handler:
+            handler(message)
+
+    async def take_token(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        """Spend `cost` tokens from `key`'s bucket; 0 if one was available, else seconds until one is"""
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= cost
+        else:
+            wait = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        while len(self.buckets) > MAX_MEMORY_BUCKETS:
+            self.buckets.popitem(last=False)
+        return wait
+
+    async def acquire_lock(self, name: str, ttl: float) -> bool:
+        """Hold `name` for `ttl` seconds unless someone already does"""
+        now = time.monotonic()
+        if self.locks.get(name, 0) > now:
+            return False
+        self.locks[name] = now + ttl
+        return True
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+# Refills and spends atomically on the server, using Redis' clock so workers on different hosts agree
+TOKEN_BUCKET_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens, updated = tonumber(state[1]), tonumber(state[2])
+if tokens == nil then
+    tokens, updated = burst, now
+end
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - cost
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+class RedisSharedState:
+    """Redis pub/sub, token buckets and locks, so every worker sees the same state"""
+
+    def __init__(self, redis, prefix: str):
+        self.redis = redis
+        self.prefix = prefix
+        self.handlers = {}
+        self.outbox = asyncio.Queue()
+        self.tasks = []
+        self.token_bucket = redis.register_script(TOKEN_BUCKET_SCRIPT)
+        self.worker_id = str(uuid.uuid4())
+
+    def subscribe(self, channel: str, handler):
+        self.handlers[channel] = handler
+
+    def publish(self, channel: str, message: dict):
+        # Callers stay synchronous; the sender task delivers in order, including back to this worker
+        self.outbox.put_nowait((self.prefix + channel, json.dumps(message)))
+
+    async def send(self):
+        while True:
+            channel, payload = await self.outbox.get()
+            try:
+                await self.redis.publish(channel, payload)
+            except Exception as e:
+                print(f"Shared state publish to {channel} failed: {e}")
+
+    async def listen(self):
+        if not self.handlers:
+            return
+        while True:
+            try:
+                # Each attempt returns its connection to the pool, however the subscription ended
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(*[self.prefix + channel for channel in self.handlers])
+                    async for message in pubsub.listen():
+                        if message["type"] != "message":
+                            continue
+                        channel = message["channel"].decode()[len(self.prefix):]
+                        try:
+                            self.handlers[channel](json.loads(message["data"]))
+                        except Exception as e:
+                            print(f"Shared state handler for {channel} failed: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Messages sent while disconnected are lost; cached users still expire after USER_CACHE_TTL_SECONDS
+                print(f"Shared state subscription lost, reconnecting: {e}")
+            await asyncio.sleep(1)
+
+    async def take_token(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        return float(await self.token_bucket(keys=[f"{self.prefix}bucket:{key}"], args=[rate, burst, cost]))
+
+    async def acquire_lock(self, name: str, ttl: float) -> bool:
+        return bool(await self.redis.set(f"{self.prefix}lock:{name}", self.worker_id, nx=True, px=int(ttl * 1000)))
+
+    async def start(self):
+        self.tasks = [asyncio.create_task(self.send()), asyncio.create_task(self.listen())]
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.redis.aclose()
+
+def create_shared_state(url: str):
+    if url.startswith("memory:"):
+        return MemorySharedState()
+    if url.startswith("fakeredis:"):
+        import fakeredis
+        return RedisSharedState(fakeredis.FakeAsyncRedis(), SHARED_STATE_PREFIX)
+    if aioredis is None:
+        raise RuntimeError(f"SHARED_STATE_URL={url} needs the redis package")
+    return RedisSharedState(aioredis.from_url(url), SHARED_STATE_PREFIX)
+
+shared_state = create_shared_state(SHARED_STATE_URL)
+shared_state.subscribe("user-cache", invalidate_cached_user)
 
 # Pydantic models
 class UserCreate(BaseModel):
@@ -119,11 +1492,45 @@ class FileUpload(BaseModel):
     file_type: str
     file_size: int
     upload_date: datetime
+    thumbnails: Dict[str, str] = {}  # longest side in px -> URL of a WebP preview
+    url: Optional[str] = None  # where to download the file; presigned when attachments live in S3
 
 class PasswordUpdate(BaseModel):
     current_password: str
     new_password: str
 
+class BulkStatusUpdate(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+    status: str
+
+class BulkDelete(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+class BulkItemResult(BaseModel):
+    id: Optional[str] = None
+    row: Optional[int] = None  # 1-based data row, for imports
+    result: str  # updated, unchanged, deleted, created, exists, not_found, conflict, invalid
+    detail: Optional[str] = None
+
+class BulkResult(BaseModel):
+    summary: Dict[str, int]
+    results: List[BulkItemResult]
+
+def bulk_result(results: List[BulkItemResult]) -> BulkResult:
+    summary = defaultdict(int)
+    for item in results:
+        summary[item.result] += 1
+    return BulkResult(summary=dict(summary), results=results)
+
+class Stats(BaseModel):
+    total: int = 0
+    by_status: Dict[str, int] = {}
+    by_severity: Dict[str, int] = {}
+    by_type: Dict[str, int] = {}
+    by_bloco: Dict[str, int] = {}
+    resolution_hours: Dict[str, Optional[float]] = {}  # p50/p90/p99, as histogram bucket upper bounds
+    daily: Dict[str, int] = {}  # YYYY-MM-DD -> incidents created
+
 class Incident(BaseModel):
     id: str
     title: str
@@ -139,14 +1546,15 @@ class Incident(BaseModel):
     updated_at: datetime
     comments_count: int = 0
     files_count: int = 0
+    last_comment_at: Optional[datetime] = None
     has_unread_comments: bool = False
 
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    return await password_pool.run(pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_pool.run(pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -159,29 +1567,38 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await resolve_user(credentials.credentials)
+
+async def resolve_user(token: str) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     
-    user = users_collection.find_one({"username": username})
+    cached_user = user_cache.get(username)
+    if cached_user is not None:
+        return cached_user
+    
+    user = await users_repo.get_by_username(username)
     if user is None:
         raise credentials_exception
     
-    return User(
+    current_user = User(
         id=user["id"],
         username=user["username"],
         email=user["email"],
         role=user["role"]
     )
+    user_cache.set(username, current_user)
+    return current_user
 
 async def get_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
@@ -191,34 +1608,748 @@ async def get_admin_user(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
-def init_admin_user():
+class EventBroker:
+    """In-process pub/sub for /api/events; each subscriber only receives incidents it may see"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers = {}
+
+    def subscribe(self, user: User) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers[queue] = user
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.pop(queue, None)
+
+    def publish(self, event_type: str, incident: dict, data: dict):
+        # Fanned out through shared_state so subscribers connected to other workers get it too
+        shared_state.publish("events", {
+            "type": event_type,
+            "incident_id": incident["id"],
+            "created_by": incident["created_by"],
+            "data": jsonable_encoder(data),
+        })
+
+    def deliver(self, event: dict):
+        for queue, user in list(self.subscribers.items()):
+            if user.role != "admin" and event["created_by"] != user.id:
+                continue
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow consumer: drop the event, the client re-fetches when it reconnects
+                pass
+
+event_broker = EventBroker(EVENT_QUEUE_SIZE)
+shared_state.subscribe("events", event_broker.deliver)
+
+async def init_admin_user():
     """Initialize default admin user"""
-    existing_admin = users_collection.find_one({"username": "admin"})
+    existing_admin = await users_repo.get_by_username("admin")
     if not existing_admin:
         admin_id = str(uuid.uuid4())
-        users_collection.insert_one({
-            "id": admin_id,
-            "username": "admin",
-            "email": "admin@vbsolucoes.com",
-            "password": get_password_hash("admin123"),
-            "role": "admin",
-            "created_at": datetime.utcnow()
-        })
+        try:
+            await users_repo.insert({
+                "id": admin_id,
+                "username": "admin",
+                "email": "admin@vbsolucoes.com",
+                "password": await get_password_hash("admin123"),
+                "role": "admin",
+                "created_at": datetime.utcnow()
+            })
+        except DuplicateKeyError:
+            # Another worker starting at the same time got there first
+            return
         print("Default admin user created: admin/admin123")
 
+async def reindex_search() -> bool:
+    """Rebuild each incident's search_comments from the comments collection"""
+    pipeline = [{"$sort": {"created_at": 1}}, {"$group": {"_id": "$incident_id", "messages": {"$push": "$message"}}}]
+    batch, indexed = [], 0
+    await incidents_collection.update_many({}, {"$set": {"search_comments": []}})
+    async for group in comments_collection.aggregate(pipeline, allowDiskUse=True):
+        messages = group["messages"][-SEARCH_COMMENTS_LIMIT:]
+        batch.append(UpdateOne({"id": group["_id"]}, {"$set": {"search_comments": messages}}))
+        if len(batch) >= 1000:
+            await incidents_collection.bulk_write(batch, ordered=False)
+            indexed += len(batch)
+            batch = []
+    if batch:
+        await incidents_collection.bulk_write(batch, ordered=False)
+        indexed += len(batch)
+    print(f"Indexed comments for {indexed} incidents")
+    return True
+
+async def rebuild_stats() -> bool:
+    """Recompute the statistics rollup from scratch; run while incidents aren't being written"""
+    # Incidents resolved before resolved_at was recorded get their last update as the resolution
+    # time, stored so later transitions subtract the same resolution bucket the rebuild counted
+    await incidents_collection.update_many(
+        {"status": RESOLVED_STATUS, "resolved_at": None},
+        [{"$set": {"resolved_at": "$updated_at"}}],
+    )
+    rollup = {}
+    count = 0
+    async for incident in incidents_collection.find({}, {"search_comments": 0, "description": 0}):
+        for path, value in rollup_contribution(incident).items():
+            node = rollup
+            *parents, leaf = path.split(".")
+            for parent in parents:
+                node = node.setdefault(parent, {})
+            node[leaf] = node.get(leaf, 0) + value
+        count += 1
+    await stats_repo.replace_rollup(rollup)
+    print(f"Rebuilt statistics from {count} incidents")
+    return True
+
+# Background jobs and garbage collection
+class JobQueue:
+    """In-process queue of background coroutines, drained by one worker task"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.worker = None
+        self.completed = 0
+        self.failed = 0
+
+    def enqueue(self, func, *args):
+        self.queue.put_nowait((func, args))
+
+    async def run(self):
+        while True:
+            func, args = await self.queue.get()
+            try:
+                await func(*args)
+                self.completed += 1
+            except Exception as e:
+                # Anything left behind is picked up by collect_garbage
+                self.failed += 1
+                print(f"Background job {func.__name__}{args} failed: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start(self):
+        self.worker = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.worker:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {"pending": self.queue.qsize(), "completed": self.completed, "failed": self.failed}
+
+job_queue = JobQueue()
+
+# What collect_garbage and cascade deletes have reclaimed since startup
+gc_counters = defaultdict(int)
+
+async def delete_incident_children(incident_id: str):
+    """Remove an incident's comments, files (and their blobs) and read markers in batches"""
+    while True:
+        batch = await comments_collection.find({"incident_id": incident_id}, {"id": 1}).limit(CASCADE_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            break
+        result = await comments_collection.delete_many({"id": {"$in": [doc["id"] for doc in batch]}})
+        gc_counters["comments_removed"] += result.deleted_count
+    while True:
+        batch = await files_repo.find({"incident_id": incident_id}, limit=CASCADE_BATCH_SIZE)
+        if not batch:
+            break
+        await files_collection.delete_many({"id": {"$in": [file_info["id"] for file_info in batch]}})
+        gc_counters["files_removed"] += len(batch)
+        for file_info in batch:
+            if await release_blob(file_info):
+                gc_counters["blobs_removed"] += 1
+    result = await read_markers_collection.delete_many({"incident_id": incident_id})
+    gc_counters["read_markers_removed"] += result.deleted_count
+
+async def orphaned_incident_ids(collection):
+    """Yield batches of incident ids referenced by `collection` that no longer exist"""
+    batch = []
+    async for group in collection.aggregate([{"$group": {"_id": "$incident_id"}}], allowDiskUse=True):
+        batch.append(group["_id"])
+        if len(batch) >= CASCADE_BATCH_SIZE:
+            yield await missing_incidents(batch)
+            batch = []
+    if batch:
+        yield await missing_incidents(batch)
+
+async def missing_incidents(incident_ids: List[str]) -> List[str]:
+    found = await incidents_collection.find({"id": {"$in": incident_ids}}, {"id": 1}).to_list(length=None)
+    existing = {doc["id"] for doc in found}
+    return [incident_id for incident_id in incident_ids if incident_id not in existing]
+
+def scan_spool(directory: str) -> List[Tuple[str, float, int]]:
+    """(name, mtime, size) of the `.{uuid}.part` files uploads and thumbnail renders spool to"""
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.startswith(".") and entry.name.endswith(".part"):
+                stat = entry.stat()
+                entries.append((entry.name, stat.st_mtime, stat.st_size))
+    return entries
+
+async def collect_garbage() -> bool:
+    """Remove child rows of deleted incidents, unreferenced blobs and orphaned files in storage"""
+    for collection in (comments_collection, files_collection, read_markers_collection):
+        async for orphaned in orphaned_incident_ids(collection):
+            for incident_id in orphaned:
+                await delete_incident_children(incident_id)
+
+    # Blobs whose last reference went away without the delete completing
+    stale_before = datetime.utcnow() - timedelta(seconds=GC_MIN_FILE_AGE_SECONDS)
+    async for blob in blobs_collection.find({"refcount": {"$lte": 0}}, {"_id": 1}):
+        claimed = await blobs_repo.claim_deletion(blob["_id"], stale_before)
+        if claimed:
+            await delete_blob(claimed)
+            gc_counters["blobs_removed"] += 1
+
+    blob_ids = set()
+    referenced = set()
+    async for blob in blobs_collection.find({}, {"filename": 1}):
+        blob_ids.add(blob["_id"])
+        referenced.add(blob["filename"])
+    async for file_info in files_collection.find({"sha256": {"$exists": False}}, {"filename": 1}):
+        referenced.add(file_info["filename"])
+
+    cutoff = time.time() - GC_MIN_FILE_AGE_SECONDS
+    for key, mtime, size in await storage.list_objects():
+        if mtime > cutoff:
+            continue
+        if key.startswith("thumbs/"):
+            orphaned = key[len("thumbs/"):].split("_", 1)[0] not in blob_ids
+        else:
+            orphaned = key not in referenced
+        if orphaned:
+            await storage.delete(key)
+            gc_counters["upload_files_removed"] += 1
+            gc_counters["bytes_reclaimed"] += size
+    # Spooled parts left by interrupted uploads
+    for name, mtime, size in await file_io.run(scan_spool, storage.spool_dir):
+        if mtime <= cutoff:
+            await file_io.remove(os.path.join(storage.spool_dir, name))
+            gc_counters["upload_files_removed"] += 1
+            gc_counters["bytes_reclaimed"] += size
+
+    gc_counters["runs"] += 1
+    print(f"Garbage collection: {dict(gc_counters)}")
+    return True
+
+async def garbage_collector():
+    while True:
+        await asyncio.sleep(GC_INTERVAL_SECONDS)
+        try:
+            # One worker per interval does the sweep
+            if await shared_state.acquire_lock("gc", GC_INTERVAL_SECONDS * 0.9):
+                await collect_garbage()
+        except Exception as e:
+            print(f"Garbage collection failed: {e}")
+
+# Streaming uploads
+class UploadedFile:
+    """Result of streaming one multipart file part to a temporary path in the storage spool"""
+
+    def __init__(self, temp_path: str, original_name: str, file_type: str, size: int, sha256: str):
+        self.temp_path = temp_path
+        self.original_name = original_name
+        self.file_type = file_type
+        self.size = size
+        self.sha256 = sha256
+
+def upload_error(detail: str):
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+def sniff_file_type(head: bytes) -> Optional[tuple]:
+    for signature, extensions in FILE_SIGNATURES:
+        if head.startswith(signature):
+            return extensions
+    return None
+
+async def run_blocking(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+class FileIOPool:
+    """Bounded thread pool for filesystem calls, so a slow or network-mounted UPLOAD_DIR never blocks the event loop"""
+
+    def __init__(self, workers: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="file-io")
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def open(self, path: str, mode: str):
+        return await self.run(open, path, mode)
+
+    async def exists(self, path: str) -> bool:
+        return await self.run(os.path.exists, path)
+
+    async def remove(self, path: str):
+        await self.run(remove_if_exists, path)
+
+    async def replace(self, source: str, destination: str):
+        await self.run(os.replace, source, destination)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+file_io = FileIOPool(FILE_IO_WORKERS)
+
+def remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+# Attachment storage. Keys are paths relative to the storage root: `{sha256}{ext}`
+# for blobs, `{uuid}_{name}` for legacy uploads and `thumbs/{sha256}_{size}.webp`.
+# Uploads are spooled to a local `.{uuid}.part` file first, since the key is the
+# content hash and only known once the last byte has arrived.
+class LocalStorage:
+    """Blobs on the local filesystem under UPLOAD_DIR, served by the /uploads mount"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        self.spool_dir = root
+        os.makedirs(os.path.join(root, "thumbs"), exist_ok=True)
+
+    def spool_path(self) -> str:
+        return os.path.join(self.spool_dir, f".{uuid.uuid4()}.part")
+
+    def local_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.root, key)
+
+    async def put(self, source_path: str, key: str):
+        """Move a spooled file into place under `key`"""
+        await file_io.replace(source_path, self.local_path(key))
+
+    async def exists(self, key: str) -> bool:
+        return await file_io.exists(self.local_path(key))
+
+    async def delete(self, key: str):
+        await file_io.remove(self.local_path(key))
+
+    async def download(self, key: str, path: str):
+        await file_io.run(shutil.copyfile, self.local_path(key), path)
+
+    def url(self, key: str) -> str:
+        return f"/uploads/{key}"
+
+    def url_epoch(self) -> int:
+        return 0
+
+    async def list_objects(self) -> List[Tuple[str, float, int]]:
+        """(key, mtime, size) of every stored object, spooled parts excluded"""
+        return await file_io.run(self.scan)
+
+    def scan(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        for prefix in ("", "thumbs/"):
+            with os.scandir(os.path.join(self.root, prefix)) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.startswith("."):
+                        stat = entry.stat()
+                        entries.append((prefix + entry.name, stat.st_mtime, stat.st_size))
+        return entries
+
+class S3Storage:
+    """
+    Blobs in an S3-compatible bucket. Transfers run on the file I/O pool through
+    boto3's managed transfer, which switches to a multipart upload above
+    S3_MULTIPART_CHUNK_SIZE; clients download via presigned GET URLs.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str, endpoint_url: Optional[str], public_endpoint_url: Optional[str]):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires boto3")
+        if not bucket:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.spool_dir = STORAGE_SPOOL_DIR
+        config = BotoConfig(max_pool_connections=FILE_IO_WORKERS, signature_version="s3v4")
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, config=config)
+        # Presigned URLs carry the host they were signed for
+        self.presigner = self.client
+        if public_endpoint_url:
+            self.presigner = boto3.client("s3", endpoint_url=public_endpoint_url, config=config)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+            use_threads=False,
+        )
+
+    def spool_path(self) -> str:
+        return os.path.join(self.spool_dir, f".{uuid.uuid4()}.part")
+
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    async def put(self, source_path: str, key: str):
+        """Upload a spooled file under `key`, then drop the spool copy"""
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        await file_io.run(partial(
+            self.client.upload_file, source_path, self.bucket, self.prefix + key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": "public, max-age=31536000, immutable"},
+            Config=self.transfer_config,
+        ))
+        await file_io.remove(source_path)
+
+    async def exists(self, key: str) -> bool:
+        try:
+            await file_io.run(partial(self.client.head_object, Bucket=self.bucket, Key=self.prefix + key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    async def delete(self, key: str):
+        await file_io.run(partial(self.client.delete_object, Bucket=self.bucket, Key=self.prefix + key))
+
+    async def download(self, key: str, path: str):
+        await file_io.run(partial(
+            self.client.download_file, self.bucket, self.prefix + key, path, Config=self.transfer_config
+        ))
+
+    def url(self, key: str) -> str:
+        # Signing is local computation, no request is made
+        return self.presigner.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.prefix + key},
+            ExpiresIn=S3_URL_TTL_SECONDS,
+        )
+
+    def url_epoch(self) -> int:
+        """Changes every half TTL, so an ETag including it never revalidates to an expired URL"""
+        return int(time.time() // max(S3_URL_TTL_SECONDS // 2, 1))
+
+    async def list_objects(self) -> List[Tuple[str, float, int]]:
+        return await file_io.run(self.scan)
+
+    def scan(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                entries.append((item["Key"][len(self.prefix):], item["LastModified"].timestamp(), item["Size"]))
+        return entries
+
+def create_storage():
+    if STORAGE_BACKEND == "s3":
+        return S3Storage(S3_BUCKET, S3_PREFIX, S3_ENDPOINT_URL, S3_PUBLIC_ENDPOINT_URL)
+    if STORAGE_BACKEND != "local":
+        raise RuntimeError(f"Unsupported STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return LocalStorage(UPLOAD_DIR)
+
+storage = create_storage()
+
+if storage.name == "local":
+    app.mount("/uploads", ImmutableStaticFiles(directory=UPLOAD_DIR), name="uploads")
+else:
+    @app.get("/uploads/{key:path}")
+    async def redirect_upload(key: str):
+        """Links saved before the move to a bucket keep working"""
+        return RedirectResponse(storage.url(key), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+async def receive_upload(request: Request, field_name: str = "file") -> UploadedFile:
+    """
+    Parse the multipart body as it arrives and write the `field_name` part straight
+    to the storage spool, enforcing MAX_UPLOAD_SIZE per chunk, hashing with SHA-256 and
+    checking the content signature against the extension.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise upload_error("Expected a multipart/form-data upload")
+
+    events = []
+    part_headers = {}
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        part_headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("headers", dict(part_headers)))
+        part_headers.clear()
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    temp_path = None
+    output = None
+    original_name = None
+    allowed_extensions = None
+    file_ext = None
+    head = b""
+    size = 0
+    digest = hashlib.sha256()
+    in_file_part = False
+    finished = False
+
+    try:
+        async for chunk in request.stream():
+            UPLOAD_BYTES.inc(len(chunk))
+            parser.write(chunk)
+            for kind, value in events:
+                if kind == "headers":
+                    _, disposition = parse_options_header(value.get(b"content-disposition", b""))
+                    in_file_part = output is None and disposition.get(b"name") == field_name.encode()
+                    if not in_file_part:
+                        continue
+                    original_name = os.path.basename(disposition.get(b"filename", b"").decode("utf-8", "replace"))
+                    file_ext = os.path.splitext(original_name)[1].lower()
+                    if file_ext not in ALLOWED_FILE_TYPES:
+                        raise upload_error("Only JPG, JPEG, PNG, and PDF files are allowed")
+                    temp_path = storage.spool_path()
+                    output = await file_io.open(temp_path, "wb")
+                elif kind == "data" and in_file_part:
+                    size += len(value)
+                    if size > MAX_UPLOAD_SIZE:
+                        raise upload_error("File size must be less than 5MB")
+                    if allowed_extensions is None:
+                        head += value
+                        if len(head) < 8:
+                            continue
+                        allowed_extensions = sniff_file_type(head)
+                        if allowed_extensions is None or file_ext not in allowed_extensions:
+                            raise upload_error("File content does not match a JPG, PNG or PDF file")
+                        value, head = head, b""
+                    digest.update(value)
+                    await file_io.run(output.write, value)
+                elif kind == "end" and in_file_part:
+                    in_file_part = False
+                    finished = True
+            events.clear()
+        parser.finalize()
+
+        if not finished:
+            raise upload_error("No file uploaded")
+        if allowed_extensions is None:
+            allowed_extensions = sniff_file_type(head)
+            if allowed_extensions is None or file_ext not in allowed_extensions:
+                raise upload_error("File content does not match a JPG, PNG or PDF file")
+            digest.update(head)
+            await file_io.run(output.write, head)
+        await file_io.run(output.close)
+    except BaseException:
+        if output is not None:
+            await file_io.run(output.close)
+            await file_io.remove(temp_path)
+        raise
+
+    return UploadedFile(temp_path, original_name, file_ext, size, digest.hexdigest())
+
+# Content-addressed attachment storage: identical bytes are kept once under the
+# key {sha256}{ext} and shared by every file document that uploads them
+def hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def store_blob(source_path: str, sha256: str, file_type: str, size: int) -> Tuple[str, bool]:
+    """
+    Reference the blob for `sha256`, putting `source_path` into storage only if it isn't
+    stored yet. Returns the blob filename and whether `source_path` was a duplicate.
+    """
+    blob = await blobs_repo.acquire(sha256, f"{sha256}{file_type}", size)
+    # A new row may still find stale bytes the garbage collector is about to remove, so always write them
+    if blob["refcount"] > 1 and await storage.exists(blob["filename"]):
+        await file_io.remove(source_path)
+        return blob["filename"], True
+    try:
+        await storage.put(source_path, blob["filename"])
+    except Exception:
+        await release_blob({"sha256": sha256, "filename": blob["filename"]})
+        raise
+    return blob["filename"], False
+
+def thumbnail_key(sha256: str, size: int) -> str:
+    return f"thumbs/{sha256}_{size}.webp"
+
+async def release_blob(file_info: dict) -> bool:
+    """Drop a file document's reference and delete the bytes once unreferenced"""
+    if "sha256" not in file_info:
+        # Legacy per-upload file, not shared
+        await storage.delete(file_info["filename"])
+        return True
+    blob = await blobs_repo.release(file_info["sha256"])
+    if blob is None:
+        return False
+    await delete_blob(blob)
+    return True
+
+async def delete_blob(blob: dict):
+    """Delete a claimed blob's bytes and previews, then its row"""
+    await storage.delete(blob["filename"])
+    for size in THUMBNAIL_SIZES:
+        await storage.delete(thumbnail_key(blob["_id"], size))
+    await blobs_repo.forget(blob)
+
+def render_thumbnails(source_path: str, file_type: str, sizes: List[int]) -> Dict[int, str]:
+    """Write WebP thumbnails of an image (or a PDF's first page) to spool files and return {size: path}"""
+    if Image is None or (file_type == ".pdf" and pypdfium2 is None):
+        return {}
+    if file_type == ".pdf":
+        pdf = pypdfium2.PdfDocument(source_path)
+        try:
+            page = pdf[0]
+            # Render the longest side at the largest thumbnail size, whatever the page dimensions
+            image = page.render(scale=max(THUMBNAIL_SIZES) / max(page.get_size())).to_pil()
+        finally:
+            pdf.close()
+    else:
+        image = Image.open(source_path)
+        # Let the JPEG decoder downscale while decoding instead of inflating the full photo
+        image.draft("RGB", (max(THUMBNAIL_SIZES), max(THUMBNAIL_SIZES)))
+        width, height = image.size
+        if width * height > MAX_THUMBNAIL_SOURCE_PIXELS:
+            raise ValueError(f"{width}x{height} image exceeds {MAX_THUMBNAIL_SOURCE_PIXELS} pixels")
+        image = ImageOps.exif_transpose(image)
+    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    rendered = {}
+    for size in sizes:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size))
+        rendered[size] = storage.spool_path()
+        thumbnail.save(rendered[size], "WEBP", quality=80)
+    return rendered
+
+async def generate_thumbnails(sha256: str, filename: str, file_type: str):
+    """Background task run after upload_file; previews are shared by every file with the same bytes"""
+    keys = {size: thumbnail_key(sha256, size) for size in THUMBNAIL_SIZES}
+    rendered = {}
+    download = None
+    try:
+        missing = [size for size, key in keys.items() if not await storage.exists(key)]
+        if missing:
+            source_path = storage.local_path(filename)
+            if source_path is None:
+                download = source_path = storage.spool_path()
+                await storage.download(filename, download)
+            rendered = await file_io.run(render_thumbnails, source_path, file_type, missing)
+            if len(rendered) < len(missing):
+                return
+            while rendered:
+                size, path = rendered.popitem()
+                await storage.put(path, keys[size])
+    except Exception as e:
+        print(f"Thumbnail generation failed for {filename}: {e}")
+        return
+    finally:
+        for path in [download, *rendered.values()]:
+            if path:
+                await file_io.remove(path)
+    await files_repo.set_thumbnails(sha256, {str(size): key for size, key in keys.items()})
+
+def thumbnail_urls(thumbnails: Dict[str, str]) -> Dict[str, str]:
+    # Documents written before storage backends stored "/uploads/thumbs/..." URL paths
+    return {size: storage.url(key.removeprefix("/uploads/")) for size, key in thumbnails.items()}
+
+async def dedupe_uploads() -> bool:
+    """
+    Move legacy `{uuid}_{name}` uploads from UPLOAD_DIR into content-addressed blobs,
+    merging identical files. With STORAGE_BACKEND=s3 this also copies them into the bucket.
+    """
+    legacy = await files_collection.find({"sha256": {"$exists": False}}, {"id": 1}).to_list(length=None)
+    migrated = missing = reclaimed_bytes = 0
+    for doc in legacy:
+        file_info = await files_repo.get(doc["id"])
+        legacy_path = os.path.join(UPLOAD_DIR, file_info["filename"])
+        if not await file_io.exists(legacy_path):
+            missing += 1
+            continue
+        size = await file_io.run(os.path.getsize, legacy_path)
+        sha256 = await file_io.run(hash_file, legacy_path)
+        filename, duplicate = await store_blob(legacy_path, sha256, file_info["file_type"], size)
+        if duplicate:
+            reclaimed_bytes += size
+        await files_repo.update(file_info["id"], {"filename": filename, "sha256": sha256})
+        await generate_thumbnails(sha256, filename, file_info["file_type"])
+        migrated += 1
+    print(f"Migrated {migrated} files, {missing} missing on disk, {reclaimed_bytes} bytes reclaimed")
+    return True
+
 # API Routes
 @app.on_event("startup")
 async def startup_event():
-    init_admin_user()
+    await ensure_indexes()
+    await init_admin_user()
+    await shared_state.start()
+    job_queue.start()
+    if GC_INTERVAL_SECONDS > 0:
+        app.state.garbage_collector = asyncio.create_task(garbage_collector())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    collector = getattr(app.state, "garbage_collector", None)
+    if collector:
+        collector.cancel()
+    await job_queue.stop()
+    await shared_state.close()
+    client.close()
+    password_pool.shutdown()
+    file_io.shutdown()
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "service": "VB Soluções API"}
+    return {
+        "status": "healthy",
+        "service": "VB Soluções API",
+        "user_cache": user_cache.stats(),
+        "jobs": job_queue.stats(),
+        "gc": dict(gc_counters),
+        "storage": storage.name,
+    }
+
+@app.get("/api/metrics")
+async def metrics():
+    """Prometheus text exposition of request, MongoDB, bcrypt and upload metrics"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # Aggregate every worker's samples, not just the one serving this scrape
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 @app.post("/api/register", response_model=Token)
 async def register(user: UserCreate):
     # Check if user already exists
-    existing_user = users_collection.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
+    existing_user = await users_repo.get_by_username_or_email(user.username, user.email)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -227,7 +2358,7 @@ async def register(user: UserCreate):
     
     # Create new user
     user_id = str(uuid.uuid4())
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     
     new_user = {
         "id": user_id,
@@ -238,7 +2369,14 @@ async def register(user: UserCreate):
         "created_at": datetime.utcnow()
     }
     
-    users_collection.insert_one(new_user)
+    try:
+        await users_repo.insert(new_user)
+    except DuplicateKeyError:
+        # A concurrent registration took the name or email while the password was hashing
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered"
+        )
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -261,8 +2399,8 @@ async def register(user: UserCreate):
 
 @app.post("/api/login", response_model=Token)
 async def login(user: UserLogin):
-    db_user = users_collection.find_one({"username": user.username})
-    if not db_user or not verify_password(user.password, db_user["password"]):
+    db_user = await users_repo.get_by_username(user.username)
+    if not db_user or not await verify_password(user.password, db_user["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -287,6 +2425,49 @@ async def login(user: UserLogin):
         user=user_response
     )
 
+@app.get("/api/events")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
+    """
+    Server-sent events for comment_created, status_changed and file_added.
+    EventSource can't send headers, so the JWT may also be passed as ?token=.
+    """
+    if credentials:
+        token = credentials.credentials
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    current_user = await resolve_user(token)
+    queue = event_broker.subscribe(current_user)
+
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                payload = json.dumps({"incident_id": event["incident_id"], **event["data"]})
+                yield f"event: {event['type']}\ndata: {payload}\n\n"
+        finally:
+            event_broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/me", response_model=User)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
@@ -311,12 +2492,31 @@ async def create_incident(incident: IncidentCreate, current_user: User = Depends
         "updated_at": now
     }
     
-    incidents_collection.insert_one(new_incident)
+    await incidents_repo.insert(new_incident)
+    await stats_repo.apply(None, new_incident)
     
     return Incident(**new_incident)
 
+async def annotate_unread(current_user: User, incidents: List[dict]):
+    """Set has_unread_comments for a whole page from a single read_markers query"""
+    last_read = await read_markers_repo.last_read(current_user.id, [incident["id"] for incident in incidents])
+    for incident in incidents:
+        last_comment_at = incident.get("last_comment_at")
+        read_at = last_read.get(incident["id"])
+        incident["has_unread_comments"] = last_comment_at is not None and (read_at is None or last_comment_at > read_at)
+
 @app.get("/api/incidents", response_model=List[Incident])
-async def get_incidents(status: Optional[str] = None, current_user: User = Depends(get_current_user)):
+async def get_incidents(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """List incidents newest first; pass `limit` and the `X-Next-Cursor` header value as `cursor` to page"""
+    projection = parse_fields(fields, Incident)
     query = {}
     if current_user.role != "admin":
         # Regular users can only see their own incidents
@@ -326,19 +2526,342 @@ async def get_incidents(status: Optional[str] = None, current_user: User = Depen
     if status:
         query["status"] = status
     
-    incidents = list(incidents_collection.find(query).sort("created_at", -1))
+    # comments_count/files_count are denormalized on the incident by
+    # create_comment, upload_file and delete_file, so one query is enough
+    # updated_at/last_comment_at are always read for the ETag and unread state
+    internal_fields = [field for field in ("updated_at", "last_comment_at") if projection and field not in projection]
+    read_fields = projection + internal_fields if projection else None
+    incidents, next_cursor = await incidents_repo.list_visible(query, limit=limit, cursor=cursor, fields=read_fields)
+    
+    await annotate_unread(current_user, incidents)
+    
+    etag = listing_etag(
+        current_user.id, query, fields, next_cursor,
+        [(incident["id"], incident["updated_at"], incident["has_unread_comments"]) for incident in incidents],
+    )
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    # Add counts for comments and files
     for incident in incidents:
-        incident["comments_count"] = comments_collection.count_documents({"incident_id": incident["id"]})
-        incident["files_count"] = files_collection.count_documents({"incident_id": incident["id"]})
-        incident["has_unread_comments"] = False  # You can implement this logic later
+        for field in internal_fields:
+            incident.pop(field, None)
+        if projection and "has_unread_comments" not in projection:
+            del incident["has_unread_comments"]
+    
+    return page_response(incidents, Incident, projection, response, next_cursor, etag)
+
+def histogram_percentile(histogram: Dict[str, int], pct: float) -> Optional[float]:
+    """Upper bound of the bucket holding the pct-th percentile; None when empty or past the last bound"""
+    total = sum(histogram.values())
+    if total <= 0:
+        return None
+    seen = 0
+    for bound in RESOLUTION_BUCKETS_HOURS:
+        seen += histogram.get(str(bound), 0)
+        if seen >= total * pct / 100:
+            return float(bound)
+    return None
+
+@app.get("/api/stats", response_model=Stats)
+async def get_stats(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(get_admin_user)
+):
+    """Dashboard statistics, read from the materialized rollup in constant time"""
+    rollup = await stats_repo.get_rollup()
+    histogram = rollup.get("resolution_hours", {})
+    today = datetime.utcnow().date()
+    daily = rollup.get("daily", {})
+    return Stats(
+        total=rollup.get("total", 0),
+        by_status=rollup.get("by_status", {}),
+        by_severity=rollup.get("by_severity", {}),
+        by_type=rollup.get("by_type", {}),
+        by_bloco=rollup.get("by_bloco", {}),
+        resolution_hours={f"p{pct}": histogram_percentile(histogram, pct) for pct in (50, 90, 99)},
+        daily={
+            day: daily.get(day, 0)
+            for day in ((today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1))
+        },
+    )
+
+@app.post("/api/incidents/bulk/status", response_model=BulkResult)
+async def bulk_update_status(bulk: BulkStatusUpdate, current_user: User = Depends(get_admin_user)):
+    """Set the status of many incidents with one bulk_write; repeating the call is a no-op"""
+    ids = list(dict.fromkeys(bulk.ids))
+    existing = {incident["id"]: incident for incident in await incidents_repo.find({"id": {"$in": ids}})}
+    
+    now = datetime.utcnow()
+    changes = {"status": bulk.status, "updated_at": now}
+    if bulk.status == RESOLVED_STATUS:
+        changes["resolved_at"] = now
+    
+    pending = [incident_id for incident_id in ids if incident_id in existing and existing[incident_id]["status"] != bulk.status]
+    updated = set()
+    if pending:
+        updated = await incidents_repo.set_status_unchanged([existing[incident_id] for incident_id in pending], changes)
+    
+    await stats_repo.apply_many([(existing[incident_id], {**existing[incident_id], **changes}) for incident_id in updated])
+    
+    results = []
+    for incident_id in ids:
+        if incident_id not in existing:
+            results.append(BulkItemResult(id=incident_id, result="not_found"))
+        elif incident_id in updated:
+            event_broker.publish("status_changed", existing[incident_id], {"status": bulk.status, "updated_at": now})
+            results.append(BulkItemResult(id=incident_id, result="updated"))
+        elif incident_id in pending:
+            results.append(BulkItemResult(id=incident_id, result="conflict", detail="Changed concurrently, retry"))
+        else:
+            results.append(BulkItemResult(id=incident_id, result="unchanged"))
+    return bulk_result(results)
+
+@app.post("/api/incidents/bulk/delete", response_model=BulkResult)
+async def bulk_delete_incidents(bulk: BulkDelete, current_user: User = Depends(get_admin_user)):
+    """Delete many incidents with one bulk_write; ids that are already gone report not_found"""
+    ids = list(dict.fromkeys(bulk.ids))
+    existing = {incident["id"]: incident for incident in await incidents_repo.find({"id": {"$in": ids}})}
+    
+    deleted = set()
+    if existing:
+        removed = await incidents_repo.delete_unchanged(list(existing.values()))
+        await stats_repo.apply_many([(incident, None) for incident in removed])
+        deleted = {incident["id"] for incident in removed}
+        for incident_id in deleted:
+            job_queue.enqueue(delete_incident_children, incident_id)
+    # Ids we read but didn't delete: changed concurrently if still there, deleted concurrently if not
+    skipped = [incident_id for incident_id in existing if incident_id not in deleted]
+    remaining = {incident["id"] for incident in await incidents_repo.find({"id": {"$in": skipped}})} if skipped else set()
+    
+    results = []
+    for incident_id in ids:
+        if incident_id not in existing or (incident_id not in deleted and incident_id not in remaining):
+            results.append(BulkItemResult(id=incident_id, result="not_found"))
+        elif incident_id in deleted:
+            results.append(BulkItemResult(id=incident_id, result="deleted"))
+        else:
+            results.append(BulkItemResult(id=incident_id, result="conflict", detail="Changed concurrently, retry"))
+    return bulk_result(results)
+
+def parse_import_datetime(value: str) -> datetime:
+    """ISO 8601 timestamp as naive UTC, like every datetime the API stores"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_import_row(row: dict, current_user: User, now: datetime) -> dict:
+    """Build an incident from a CSV row of the paper occurrence book; raises ValueError when invalid"""
+    values = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+    missing = [column for column in IMPORT_REQUIRED_COLUMNS if not values.get(column)]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    created_at = parse_import_datetime(values["created_at"]) if values.get("created_at") else now
+    # external_id (e.g. book page/entry) keys the record; otherwise its content does
+    key = values.get("external_id") or "|".join([values[column] for column in IMPORT_REQUIRED_COLUMNS] + [created_at.isoformat()])
+    incident = {
+        "id": str(uuid.uuid5(IMPORT_NAMESPACE, key)),
+        "title": values["title"],
+        "description": values["description"],
+        "type": values["type"],
+        "location": values["location"],
+        "people_involved": values["people_involved"],
+        "severity": values["severity"],
+        "status": values.get("status") or RESOLVED_STATUS,
+        "created_by": current_user.id,
+        "created_by_username": current_user.username,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "imported_at": now,
+    }
+    if incident["status"] == RESOLVED_STATUS:
+        incident["resolved_at"] = parse_import_datetime(values["resolved_at"]) if values.get("resolved_at") else created_at
+        if incident["resolved_at"] < created_at:
+            raise ValueError("resolved_at is before created_at")
+    return incident
+
+@app.post("/api/incidents/bulk/import", response_model=BulkResult)
+async def bulk_import_incidents(file: UploadFile = File(...), current_user: User = Depends(get_admin_user)):
+    """
+    Import historical paper records from a CSV with columns title, description, type,
+    location, people_involved, severity and optional status, created_at, resolved_at,
+    external_id. Rows are upserted by a deterministic id, so re-importing is safe.
+    """
+    # The multipart body is spooled to disk; only read as much of it as an import may be
+    content = await file.read(MAX_IMPORT_SIZE + 1)
+    if len(content) > MAX_IMPORT_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Import file must be less than {MAX_IMPORT_SIZE // (1024 * 1024)}MB"
+        )
+    now = datetime.utcnow()
+    results, rows = [], []
+    for number, row in enumerate(csv.DictReader(io.StringIO(content.decode("utf-8-sig"))), start=1):
+        if number > MAX_BULK_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MAX_BULK_ITEMS} rows per import"
+            )
+        try:
+            rows.append((number, parse_import_row(row, current_user, now)))
+        except ValueError as e:
+            results.append(BulkItemResult(row=number, result="invalid", detail=str(e)))
+    
+    created = set()
+    if rows:
+        created = await incidents_repo.insert_missing([incident for _, incident in rows])
+        await stats_repo.apply_many([(None, rows[index][1]) for index in created])
+    
+    for index, (number, incident) in enumerate(rows):
+        results.append(BulkItemResult(id=incident["id"], row=number, result="created" if index in created else "exists"))
+    results.sort(key=lambda item: item.row)
+    return bulk_result(results)
+
+def export_row(incident: dict) -> list:
+    return [incident.get(column, 0 if column.endswith("_count") else None) for column in EXPORT_COLUMNS]
+
+async def export_csv(cursor):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the accents correctly
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    rows = 0
+    async for incident in cursor:
+        writer.writerow(["" if value is None else value for value in export_row(incident)])
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+async def export_jsonl(cursor):
+    lines = []
+    async for incident in cursor:
+        lines.append(json.dumps(jsonable_encoder(dict(zip(EXPORT_COLUMNS, export_row(incident)))), ensure_ascii=False))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+async def export_xlsx(cursor):
+    # xlsxwriter's constant_memory mode flushes each row to a temp file, so memory stays
+    # flat; the finished workbook is then streamed from disk
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "remove_timezone": True})
+        worksheet = workbook.add_worksheet("Ocorrências")
+        date_format = workbook.add_format({"num_format": "dd/mm/yyyy hh:mm"})
+        worksheet.write_row(0, 0, EXPORT_COLUMNS)
+
+        def write_rows(first_row, rows):
+            for offset, row in enumerate(rows):
+                for col, value in enumerate(row):
+                    if isinstance(value, datetime):
+                        worksheet.write_datetime(first_row + offset, col, value, date_format)
+                    elif value is not None:
+                        worksheet.write(first_row + offset, col, value)
+
+        next_row, batch = 1, []
+        async for incident in cursor:
+            batch.append(export_row(incident))
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                await run_blocking(write_rows, next_row, batch)
+                next_row += len(batch)
+                batch = []
+        await run_blocking(write_rows, next_row, batch)
+        await run_blocking(workbook.close)
+
+        f = await file_io.open(path, "rb")
+        try:
+            while True:
+                chunk = await file_io.run(f.read, FILE_IO_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await file_io.run(f.close)
+    finally:
+        await file_io.remove(path)
+
+EXPORT_FORMATS = {
+    "csv": (export_csv, "text/csv; charset=utf-8"),
+    "jsonl": (export_jsonl, "application/x-ndjson"),
+    "xlsx": (export_xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+@app.get("/api/incidents/export")
+async def export_incidents(
+    format: str = Query("csv", pattern="^(csv|jsonl|xlsx)$"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    status: Optional[str] = None,
+    bloco: Optional[str] = None,
+    apartment: Optional[str] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """Stream the occurrence book (livro de ocorrência) for audits; `end` is inclusive"""
+    if format == "xlsx" and xlsxwriter is None:
+        raise HTTPException(
+            status_code=400,
+            detail="XLSX export is not available on this server"
+        )
     
+    query = {}
+    created_at = {}
+    if start:
+        created_at["$gte"] = datetime.combine(start, datetime.min.time())
+    if end:
+        created_at["$lt"] = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    if created_at:
+        query["created_at"] = created_at
+    if status:
+        query["status"] = status
+    if bloco:
+        query["people_involved"] = bloco
+    if apartment:
+        query["location"] = apartment
+    
+    # comments_count/files_count are denormalized, so a single cursor carries the whole row
+    generator, media_type = EXPORT_FORMATS[format]
+    filename = f"livro-de-ocorrencias-{datetime.utcnow():%Y%m%d}.{format}"
+    return StreamingResponse(
+        generator(incidents_repo.stream(query, EXPORT_COLUMNS)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/incidents/search", response_model=List[Incident])
+async def search_incidents(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Full-text search over incidents and their comments, most relevant first"""
+    query = {}
+    if current_user.role != "admin":
+        # Same scoping as get_incidents
+        query["created_by"] = current_user.id
+    
+    offset = decode_offset_cursor(cursor)
+    incidents = await incidents_repo.search(query, q, limit + 1, offset)
+    
+    if len(incidents) > limit:
+        incidents = incidents[:limit]
+        response.headers["X-Next-Cursor"] = encode_offset_cursor(offset + limit)
+    
+    await annotate_unread(current_user, incidents)
     return [Incident(**incident) for incident in incidents]
 
 @app.get("/api/incidents/{incident_id}", response_model=Incident)
 async def get_incident(incident_id: str, current_user: User = Depends(get_current_user)):
-    incident = incidents_collection.find_one({"id": incident_id})
+    incident = await incidents_repo.get(incident_id)
     if not incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -361,22 +2884,23 @@ async def update_incident_status(
     current_user: User = Depends(get_admin_user)
 ):
     """Only admins can update incident status"""
-    result = incidents_collection.update_one(
-        {"id": incident_id},
-        {
-            "$set": {
-                "status": status_update.status,
-                "updated_at": datetime.utcnow()
-            }
-        }
-    )
+    now = datetime.utcnow()
+    changes = {"status": status_update.status, "updated_at": now}
+    if status_update.status == RESOLVED_STATUS:
+        changes["resolved_at"] = now
+    previous = await incidents_repo.update_and_get(incident_id, changes, before=True)
     
-    if result.matched_count == 0:
+    if not previous:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Incident not found"
         )
     
+    updated = {**previous, **changes}
+    await stats_repo.apply(previous, updated)
+    
+    event_broker.publish("status_changed", updated, {"status": updated["status"], "updated_at": updated["updated_at"]})
+    
     return {"message": "Status updated successfully"}
 
 @app.put("/api/incidents/{incident_id}", response_model=Incident)
@@ -385,7 +2909,7 @@ async def update_incident(
     incident_update: IncidentUpdate, 
     current_user: User = Depends(get_current_user)
 ):
-    incident = incidents_collection.find_one({"id": incident_id})
+    incident = await incidents_repo.get(incident_id)
     if not incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -405,25 +2929,32 @@ async def update_incident(
         if value is not None:
             update_data[field] = value
     
-    incidents_collection.update_one(
-        {"id": incident_id},
-        {"$set": update_data}
-    )
+    previous = await incidents_repo.update_and_get(incident_id, update_data, before=True)
+    if not previous:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incident not found"
+        )
     
-    updated_incident = incidents_collection.find_one({"id": incident_id})
+    updated_incident = {**previous, **update_data}
+    await stats_repo.apply(previous, updated_incident)
     return Incident(**updated_incident)
 
 @app.delete("/api/incidents/{incident_id}")
 async def delete_incident(incident_id: str, current_user: User = Depends(get_admin_user)):
     """Only admins can delete incidents"""
-    result = incidents_collection.delete_one({"id": incident_id})
+    deleted = await incidents_repo.delete_and_get(incident_id)
     
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Incident not found"
         )
     
+    await stats_repo.apply(deleted, None)
+    # Comments, files and blobs go in the background so the response isn't held up
+    job_queue.enqueue(delete_incident_children, incident_id)
+    
     return {"message": "Incident deleted successfully"}
 
 @app.post("/api/incidents/{incident_id}/comments", response_model=Comment)
@@ -434,7 +2965,7 @@ async def create_comment(
 ):
     """Create a new comment for an incident"""
     # Check if incident exists and user has permission
-    incident = incidents_collection.find_one({"id": incident_id})
+    incident = await incidents_repo.get(incident_id)
     if not incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -461,22 +2992,52 @@ async def create_comment(
         "created_at": now
     }
     
-    comments_collection.insert_one(new_comment)
+    await comments_repo.insert(new_comment)
     
     # Update incident with comment count
-    comment_count = comments_collection.count_documents({"incident_id": incident_id})
-    incidents_collection.update_one(
-        {"id": incident_id},
-        {"$set": {"comments_count": comment_count, "updated_at": now}}
-    )
+    comment_count = await incidents_repo.record_comment(incident_id, comment.message, now)
+    # The author has obviously seen their own comment
+    await read_markers_repo.mark_read(current_user.id, incident_id, now)
     
-    return Comment(**new_comment)
+    created = Comment(**new_comment)
+    event_broker.publish("comment_created", incident, {"comment": created, "comments_count": comment_count})
+    return created
+
+@app.post("/api/incidents/{incident_id}/read")
+async def mark_incident_read(incident_id: str, current_user: User = Depends(get_current_user)):
+    """Mark every comment currently on an incident as read by the current user"""
+    incident = await incidents_repo.get(incident_id)
+    if not incident:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Incident not found"
+        )
+    
+    # Check permissions (only creator or admin can read the thread)
+    if current_user.role != "admin" and incident["created_by"] != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    await read_markers_repo.mark_read(current_user.id, incident_id, incident.get("last_comment_at") or datetime.utcnow())
+    
+    return {"message": "Incident marked as read"}
 
 @app.get("/api/incidents/{incident_id}/comments", response_model=List[Comment])
-async def get_comments(incident_id: str, current_user: User = Depends(get_current_user)):
-    """Get all comments for an incident"""
+async def get_comments(
+    incident_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get comments for an incident, oldest first"""
+    projection = parse_fields(fields, Comment)
     # Check if incident exists and user has permission
-    incident = incidents_collection.find_one({"id": incident_id})
+    incident = await incidents_repo.get(incident_id)
     if not incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -490,18 +3051,25 @@ async def get_comments(incident_id: str, current_user: User = Depends(get_curren
             detail="Not enough permissions"
         )
     
-    comments = list(comments_collection.find({"incident_id": incident_id}).sort("created_at", 1))
-    return [Comment(**comment) for comment in comments]
+    # create_comment bumps the incident's updated_at, so it versions the thread
+    etag = listing_etag(incident_id, incident["updated_at"], incident.get("comments_count", 0), limit, cursor, fields)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    comments, next_cursor = await comments_repo.list_for_incident(incident_id, limit=limit, cursor=cursor, fields=projection)
+    return page_response(comments, Comment, projection, response, next_cursor, etag)
 
 @app.post("/api/incidents/{incident_id}/files")
 async def upload_file(
     incident_id: str,
-    file: UploadFile = File(...),
+    request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
-    """Upload a file for an incident"""
+    """Upload a file for an incident (multipart field `file`), streamed to the storage backend"""
     # Check if incident exists and user has permission
-    incident = incidents_collection.find_one({"id": incident_id})
+    incident = await incidents_repo.get(incident_id)
     if not incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -515,66 +3083,66 @@ async def upload_file(
             detail="Not enough permissions"
         )
     
-    # Check file count limit
-    file_count = files_collection.count_documents({"incident_id": incident_id})
-    if file_count >= 10:
+    # Check file count limit; the slot is claimed atomically so parallel uploads can't overshoot it
+    file_count = await incidents_repo.reserve_file_slot(incident_id, MAX_FILES_PER_INCIDENT)
+    if file_count is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Maximum 10 files per incident"
         )
     
-    # Check file size (5MB limit)
-    if file.size > 5 * 1024 * 1024:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size must be less than 5MB"
-        )
-    
-    # Check file type
-    allowed_types = [".jpg", ".jpeg", ".png", ".pdf"]
-    file_ext = os.path.splitext(file.filename)[1].lower()
-    if file_ext not in allowed_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Only JPG, JPEG, PNG, and PDF files are allowed"
-        )
-    
-    # Generate unique filename
-    file_id = str(uuid.uuid4())
-    filename = f"{file_id}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
-    # Save file info to database
-    file_info = {
-        "id": file_id,
-        "incident_id": incident_id,
-        "filename": filename,
-        "original_name": file.filename,
-        "file_type": file_ext,
-        "file_size": file.size,
-        "upload_date": datetime.utcnow()
-    }
-    
-    files_collection.insert_one(file_info)
-    
-    # Update incident with file count
-    file_count = files_collection.count_documents({"incident_id": incident_id})
-    incidents_collection.update_one(
-        {"id": incident_id},
-        {"$set": {"files_count": file_count, "updated_at": datetime.utcnow()}}
-    )
+    upload = filename = None
+    try:
+        # Stream to the spool; size, type and content signature are checked as bytes arrive
+        upload = await receive_upload(request)
+        
+        # Store by content hash; identical bytes are only kept once
+        file_id = str(uuid.uuid4())
+        filename, _ = await store_blob(upload.temp_path, upload.sha256, upload.file_type, upload.size)
+        
+        # Save file info to database
+        file_info = {
+            "id": file_id,
+            "incident_id": incident_id,
+            "filename": filename,
+            "original_name": upload.original_name,
+            "file_type": upload.file_type,
+            "file_size": upload.size,
+            "sha256": upload.sha256,
+            "upload_date": datetime.utcnow()
+        }
+        
+        await files_repo.insert(file_info)
+    except Exception:
+        # Rejected or failed uploads give their slot back, and their spool file and blob reference if they took one
+        await incidents_repo.release_file_slot(incident_id)
+        if upload:
+            await file_io.remove(upload.temp_path)
+        if filename:
+            await release_blob({"sha256": upload.sha256, "filename": filename})
+        raise
+    background_tasks.add_task(generate_thumbnails, upload.sha256, filename, upload.file_type)
     
+    event_broker.publish("file_added", incident, {
+        "file": FileUpload(**file_info, url=storage.url(filename)),
+        "files_count": file_count,
+    })
     return {"message": "File uploaded successfully", "file_id": file_id}
 
 @app.get("/api/incidents/{incident_id}/files", response_model=List[FileUpload])
-async def get_files(incident_id: str, current_user: User = Depends(get_current_user)):
-    """Get all files for an incident"""
+async def get_files(
+    incident_id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get files for an incident, newest first"""
+    projection = parse_fields(fields, FileUpload)
     # Check if incident exists and user has permission
-    incident = incidents_collection.find_one({"id": incident_id})
+    incident = await incidents_repo.get(incident_id)
     if not incident:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -588,13 +3156,33 @@ async def get_files(incident_id: str, current_user: User = Depends(get_current_u
             detail="Not enough permissions"
         )
     
-    files = list(files_collection.find({"incident_id": incident_id}).sort("upload_date", -1))
-    return [FileUpload(**file) for file in files]
+    # `url` is derived from the stored filename
+    read_fields = projection
+    if projection and "url" in projection and "filename" not in projection:
+        read_fields = projection + ["filename"]
+    files, next_cursor = await files_repo.list_for_incident(incident_id, limit=limit, cursor=cursor, fields=read_fields)
+    
+    # Thumbnails are attached after upload without touching the incident, so version on the files themselves;
+    # the URL epoch rolls the tag over before presigned URLs a client holds expire
+    etag = listing_etag(fields, next_cursor, storage.url_epoch(), [(file["id"], sorted(file.get("thumbnails", {}))) for file in files])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    for file_info in files:
+        if projection is None or "url" in projection:
+            file_info["url"] = storage.url(file_info["filename"])
+        if "thumbnails" in file_info:
+            file_info["thumbnails"] = thumbnail_urls(file_info["thumbnails"])
+        if read_fields is not projection:
+            del file_info["filename"]
+    
+    return page_response(files, FileUpload, projection, response, next_cursor, etag)
 
 @app.delete("/api/files/{file_id}")
 async def delete_file(file_id: str, current_user: User = Depends(get_current_user)):
     """Delete a file"""
-    file_info = files_collection.find_one({"id": file_id})
+    file_info = await files_repo.get(file_id)
     if not file_info:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -602,27 +3190,18 @@ async def delete_file(file_id: str, current_user: User = Depends(get_current_use
         )
     
     # Check permissions (only creator or admin can delete files)
-    incident = incidents_collection.find_one({"id": file_info["incident_id"]})
+    incident = await incidents_repo.get(file_info["incident_id"])
     if current_user.role != "admin" and incident["created_by"] != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    # Delete file from filesystem
-    file_path = os.path.join(UPLOAD_DIR, file_info["filename"])
-    if os.path.exists(file_path):
-        os.remove(file_path)
-    
-    # Delete file info from database
-    files_collection.delete_one({"id": file_id})
-    
-    # Update incident with file count
-    file_count = files_collection.count_documents({"incident_id": file_info["incident_id"]})
-    incidents_collection.update_one(
-        {"id": file_info["incident_id"]},
-        {"$set": {"files_count": file_count, "updated_at": datetime.utcnow()}}
-    )
+    # Delete file info from database, then the bytes if no other file shares them.
+    # Only the request whose delete actually matched gives the slot back.
+    if await files_repo.delete(file_id):
+        await incidents_repo.release_file_slot(file_info["incident_id"])
+        await release_blob(file_info)
     
     return {"message": "File deleted successfully"}
 
@@ -633,22 +3212,64 @@ async def change_password(
 ):
     """Change user password"""
     # Verify current password
-    db_user = users_collection.find_one({"id": current_user.id})
-    if not verify_password(password_update.current_password, db_user["password"]):
+    db_user = await users_repo.get(current_user.id)
+    if not await verify_password(password_update.current_password, db_user["password"]):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Update password
-    new_hashed_password = get_password_hash(password_update.new_password)
-    users_collection.update_one(
-        {"id": current_user.id},
-        {"$set": {"password": new_hashed_password, "updated_at": datetime.utcnow()}}
-    )
+    new_hashed_password = await get_password_hash(password_update.new_password)
+    await users_repo.update(current_user.id, {"password": new_hashed_password, "updated_at": datetime.utcnow()})
     
     return {"message": "Password updated successfully"}
 
+# Maintenance commands: python server.py <command>
+def worker_count() -> int:
+    if WEB_CONCURRENCY == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(WEB_CONCURRENCY))
+
+def configure_workers(workers: int):
+    """Environment every worker process inherits when serving with `workers` processes.
+
+    The same applies under gunicorn:
+    gunicorn -k uvicorn.workers.UvicornWorker -w $(nproc) --chdir backend server:app
+    """
+    # Split the cores between workers rather than giving each a full-size bcrypt pool
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // workers)))
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="vb-metrics-")
+    if SHARED_STATE_URL.startswith(("memory:", "fakeredis:")):
+        print(f"Warning: SHARED_STATE_URL={SHARED_STATE_URL} is per-process; with {workers} workers "
+              "user cache invalidation, events and rate limits won't reach other workers")
+
+COMMANDS = {
+    "verify-indexes": verify_query_plans,
+    "dedupe-uploads": dedupe_uploads,
+    "reindex-search": reindex_search,
+    "rebuild-stats": rebuild_stats,
+    "gc": collect_garbage,
+}
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        command = COMMANDS.get(sys.argv[1])
+        if command is None:
+            print(f"Unknown command {sys.argv[1]!r}, available: {', '.join(COMMANDS)}")
+            sys.exit(2)
+        sys.exit(0 if asyncio.run(command()) is not False else 1)
+
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    workers = worker_count()
+    if workers == 1:
+        uvicorn.run(app, host="0.0.0.0", port=8001)
+    else:
+        configure_workers(workers)
+        # Hand over to the uvicorn CLI: its spawned workers would otherwise re-run this file as
+        # __mp_main__ and import it again as `server`, registering every metric twice
+        os.execv(sys.executable, [
+            sys.executable, "-m", "uvicorn", "server:app", "--host", "0.0.0.0", "--port", "8001",
+            "--workers", str(workers), "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+        ])
\ No newline at end of file
@@ -0,0 +1,793 @@
+#!/usr/bin/env python3
+"""
+VB Soluções Backend Benchmarks
+Runs the FastAPI app in-process against a local MongoDB (MONGO_URL) and
+measures how routes scale with data volume.
+
+Load scenarios seed a realistic population and drive concurrent traffic,
+reporting throughput and p50/p95/p99 per endpoint:
+
+    python backend_benchmark.py --output results.json
+    python backend_benchmark.py --incidents 10000 --baseline results.json
+
+Pass --mongomock (needs mongomock-motor) to run without a mongod; absolute
+numbers are then only comparable with other mongomock runs.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+from pymongo import monitoring
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+os.environ.setdefault("DB_NAME", "vb_solucoes_benchmark")
+# Measure the app itself, not the rate limiter
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+class CommandCounter(monitoring.CommandListener):
+    """
+    Counts MongoDB commands (round-trips) issued by the server. getMore batches of an
+    open cursor are kept apart: their number follows the result size, not the query shape.
+    """
+
+    def __init__(self):
+        self.commands = []
+
+    def reset(self):
+        self.commands = []
+
+    @property
+    def queries(self):
+        return sorted(name for name in self.commands if name != "getMore")
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def get_more_count(self):
+        return self.commands.count("getMore")
+
+    def started(self, event):
+        self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class LoadRecorder:
+    """Latency and status samples per endpoint for one load scenario"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.statuses = defaultdict(list)
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    async def request(self, client, endpoint, method, url, **kwargs):
+        """Issue one request, recording it under `endpoint` (the route template)"""
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.samples[endpoint].append((time.perf_counter() - start) * 1000)
+        self.statuses[endpoint].append(response.status_code)
+        return response
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self):
+        rows = {}
+        for endpoint, timings in sorted(self.samples.items()):
+            statuses = self.statuses[endpoint]
+            rows[endpoint] = {
+                "requests": len(timings),
+                "errors": sum(1 for code in statuses if code >= 500),
+                "rejected": sum(1 for code in statuses if 400 <= code < 500),
+                "throughput_rps": round(len(timings) / self.elapsed, 1) if self.elapsed else 0.0,
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "p99_ms": round(percentile(timings, 99), 2),
+                "max_ms": round(max(timings), 2),
+            }
+        return rows
+
+
+def sample_jpeg(size=256):
+    """A JPEG of random pixels, so every upload hashes differently and still thumbnails"""
+    if Image is None:
+        return b"\xff\xd8\xff\xe0" + os.urandom(size * size)
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (size, size), os.urandom(size * size * 3)).save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Must be registered before server.py creates its client
+command_counter = CommandCounter()
+monitoring.register(command_counter)
+
+# Swap in mongomock before server.py builds its client
+USE_MONGOMOCK = "--mongomock" in sys.argv
+if USE_MONGOMOCK:
+    import motor.motor_asyncio
+    from mongomock_motor import AsyncMongoMockClient
+    motor.motor_asyncio.AsyncIOMotorClient = AsyncMongoMockClient
+
+import server  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+class VBSolucoesBenchmark:
+    def __init__(self):
+        self.client = None
+        self.admin_token = None
+        self.results = {}
+        self.residents = []
+
+        print("🚀 Starting VB Soluções Benchmarks")
+        print(f"📡 MongoDB: {'mongomock' if USE_MONGOMOCK else server.MONGO_URL} / {server.DB_NAME}")
+        print("=" * 60)
+
+    def run_async(self, coro):
+        return self.client.portal.call(lambda: coro)
+
+    def reset_database(self):
+        """Drop benchmark data and recreate the default admin"""
+        async def _reset():
+            for collection in (server.users_collection, server.incidents_collection,
+                               server.comments_collection, server.files_collection,
+                               server.blobs_collection, server.read_markers_collection):
+                await collection.delete_many({})
+            await server.init_admin_user()
+        self.run_async(_reset())
+
+    def login_admin(self):
+        response = self.client.post("/api/login", json={"username": "admin", "password": "admin123"})
+        response.raise_for_status()
+        self.admin_token = response.json()["access_token"]
+
+    def seed_incidents(self, count, comments_per_incident=2, files_per_incident=1):
+        """Insert incidents with child comments/files directly into MongoDB"""
+        async def _seed():
+            now = datetime.utcnow()
+            incidents, comments, files = [], [], []
+            for i in range(count):
+                incident_id = str(uuid.uuid4())
+                created_at = now - timedelta(minutes=i)
+                incidents.append({
+                    "id": incident_id,
+                    "title": f"Ocorrência {i}",
+                    "description": "Barulho excessivo após as 22h",
+                    "type": "barulho",
+                    "location": str(100 + i % 40),
+                    "people_involved": f"Bloco {chr(65 + i % 6)}",
+                    "severity": ("baixa", "media", "alta")[i % 3],
+                    "status": ("nova", "em_andamento", "resolvida", "cancelada")[i % 4],
+                    "created_by": "benchmark",
+                    "created_by_username": "benchmark",
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                    "comments_count": comments_per_incident,
+                    "files_count": files_per_incident,
+                })
+                if comments_per_incident:
+                    incidents[-1]["last_comment_at"] = created_at
+                for _ in range(comments_per_incident):
+                    comments.append({
+                        "id": str(uuid.uuid4()),
+                        "incident_id": incident_id,
+                        "user_id": "benchmark",
+                        "username": "benchmark",
+                        "message": "Comentário",
+                        "is_admin": False,
+                        "created_at": created_at,
+                    })
+                for _ in range(files_per_incident):
+                    file_id = str(uuid.uuid4())
+                    files.append({
+                        "id": file_id,
+                        "incident_id": incident_id,
+                        "filename": f"{file_id}_foto.jpg",
+                        "original_name": "foto.jpg",
+                        "file_type": ".jpg",
+                        "file_size": 1024,
+                        "upload_date": created_at,
+                    })
+            if incidents:
+                await server.incidents_collection.insert_many(incidents)
+            if comments:
+                await server.comments_collection.insert_many(comments)
+            if files:
+                await server.files_collection.insert_many(files)
+        self.run_async(_seed())
+
+    def bench_incident_listing_round_trips(self, sizes=(10, 100, 1000, 2000)):
+        """GET /api/incidents must issue the same Mongo commands whatever the incident count (no per-incident queries)"""
+        print("\n🔍 Incident listing round-trips")
+        if USE_MONGOMOCK:
+            print("⚠️  Skipped: mongomock bypasses the driver, so no commands can be observed")
+            return True
+        rows = []
+        signatures = set()
+        for size in sizes:
+            self.reset_database()
+            self.login_admin()
+            self.seed_incidents(size)
+
+            headers = {"Authorization": f"Bearer {self.admin_token}"}
+            command_counter.reset()
+            start = time.perf_counter()
+            response = self.client.get("/api/incidents", headers=headers)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            response.raise_for_status()
+
+            signatures.add(tuple(command_counter.queries))
+            rows.append({
+                "incidents": size,
+                "round_trips": command_counter.count,
+                "get_more": command_counter.get_more_count,
+                "commands": command_counter.queries,
+                "ms": round(elapsed_ms, 1),
+            })
+            print(f"   {size:>6} incidents -> {command_counter.count:>3} round-trips "
+                  f"(+{command_counter.get_more_count} getMore), {elapsed_ms:8.1f} ms")
+
+        flat = len(signatures) == 1
+        print(f"{'✅' if flat else '❌'} Round-trips {'stay flat' if flat else 'grow'} with incident count")
+        self.results["incident_listing_round_trips"] = rows
+        return flat
+
+    def bench_login_storm(self, logins=200, concurrency=50, health_interval=0.01):
+        """/api/health must stay responsive while bcrypt-heavy logins are in flight"""
+        print("\n🔍 /api/health latency during a login storm")
+        self.reset_database()
+
+        async def _storm():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                async def probe_health(samples, stop):
+                    while not stop.is_set():
+                        start = time.perf_counter()
+                        await client.get("/api/health")
+                        samples.append((time.perf_counter() - start) * 1000)
+                        await asyncio.sleep(health_interval)
+
+                baseline, stop = [], asyncio.Event()
+                probe = asyncio.create_task(probe_health(baseline, stop))
+                await asyncio.sleep(1)
+                stop.set()
+                await probe
+
+                semaphore = asyncio.Semaphore(concurrency)
+                statuses = []
+
+                async def login():
+                    async with semaphore:
+                        response = await client.post("/api/login", json={"username": "admin", "password": "admin123"})
+                        statuses.append(response.status_code)
+
+                during, stop = [], asyncio.Event()
+                probe = asyncio.create_task(probe_health(during, stop))
+                start = time.perf_counter()
+                await asyncio.gather(*(login() for _ in range(logins)))
+                storm_seconds = time.perf_counter() - start
+                stop.set()
+                await probe
+                return baseline, during, statuses, storm_seconds
+
+        baseline, during, statuses, storm_seconds = self.run_async(_storm())
+        row = {
+            "logins": logins,
+            "concurrency": concurrency,
+            "logins_per_second": round(logins / storm_seconds, 1),
+            "login_ok": statuses.count(200),
+            "login_busy": statuses.count(503),
+            "health_p50_idle_ms": round(percentile(baseline, 50), 2),
+            "health_p99_idle_ms": round(percentile(baseline, 99), 2),
+            "health_p50_storm_ms": round(percentile(during, 50), 2),
+            "health_p99_storm_ms": round(percentile(during, 99), 2),
+        }
+        for key, value in row.items():
+            print(f"   {key:<22} {value}")
+
+        responsive = row["health_p99_storm_ms"] < 50
+        print(f"{'✅' if responsive else '❌'} /api/health p99 {'stays low' if responsive else 'degrades'} during the storm")
+        self.results["login_storm"] = row
+        return responsive
+
+    def bench_unread_listing(self, incidents=10000, comments_per_incident=10, page_size=50, samples=50):
+        """has_unread_comments for a listing page must come from one batched query"""
+        print(f"\n🔍 Unread state with {incidents} incidents / {incidents * comments_per_incident} comments")
+        self.reset_database()
+        self.login_admin()
+        self.seed_incidents(incidents, comments_per_incident=comments_per_incident, files_per_incident=0)
+
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        admin_id = self.client.get("/api/me", headers=headers).json()["id"]
+
+        async def _mark_half_read():
+            ids = await server.incidents_collection.find({}, {"id": 1}).to_list(length=None)
+            now = datetime.utcnow()
+            await server.read_markers_collection.insert_many([
+                {"user_id": admin_id, "incident_id": doc["id"], "last_read_at": now}
+                for doc in ids[::2]
+            ])
+        self.run_async(_mark_half_read())
+
+        # Warm up indexes and the user cache
+        self.client.get(f"/api/incidents?limit={page_size}", headers=headers)
+
+        timings = []
+        for _ in range(samples):
+            command_counter.reset()
+            start = time.perf_counter()
+            response = self.client.get(f"/api/incidents?limit={page_size}", headers=headers)
+            timings.append((time.perf_counter() - start) * 1000)
+            response.raise_for_status()
+        unread = sum(1 for incident in response.json() if incident["has_unread_comments"])
+
+        row = {
+            "incidents": incidents,
+            "comments": incidents * comments_per_incident,
+            "page_size": page_size,
+            "unread_on_page": unread,
+            "round_trips": command_counter.count,
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+        }
+        for key, value in row.items():
+            print(f"   {key:<22} {value}")
+
+        fast = row["p50_ms"] < 10
+        print(f"{'✅' if fast else '❌'} Listing page p50 {'stays in' if fast else 'exceeds'} single-digit ms")
+        self.results["unread_listing"] = row
+        return fast
+
+    def bench_counter_consistency(self, incidents=5, comments_per_incident=100, uploads_per_incident=25, concurrency=50):
+        """comments_count/files_count must match the child rows exactly under parallel writers"""
+        print(f"\n🔍 Counter consistency with {concurrency} concurrent writers")
+        self.reset_database()
+        self.login_admin()
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        incident_ids = [
+            self.client.post("/api/incidents", headers=headers, json={
+                "title": f"Concorrência {i}",
+                "description": "Teste de contadores",
+                "type": "outros",
+                "location": "101",
+                "people_involved": "Bloco A",
+                "severity": "media",
+            }).json()["id"]
+            for i in range(incidents)
+        ]
+
+        async def _stress():
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers=headers) as client:
+                semaphore = asyncio.Semaphore(concurrency)
+                statuses = {"comment": [], "upload": [], "delete": []}
+
+                async def comment(incident_id, n):
+                    async with semaphore:
+                        response = await client.post(f"/api/incidents/{incident_id}/comments", json={"message": f"Comentário {n}"})
+                        statuses["comment"].append(response.status_code)
+
+                async def upload(incident_id):
+                    # Distinct bytes per upload so deduplication doesn't mask anything
+                    content = sample_jpeg(32)
+                    async with semaphore:
+                        response = await client.post(f"/api/incidents/{incident_id}/files", files={"file": ("foto.jpg", content, "image/jpeg")})
+                        statuses["upload"].append(response.status_code)
+
+                async def delete(file_id):
+                    async with semaphore:
+                        response = await client.delete(f"/api/files/{file_id}")
+                        statuses["delete"].append(response.status_code)
+
+                await asyncio.gather(*(
+                    [comment(incident_id, n) for incident_id in incident_ids for n in range(comments_per_incident)]
+                    + [upload(incident_id) for incident_id in incident_ids for _ in range(uploads_per_incident)]
+                ))
+                # Every file is deleted twice at once; only one of each pair may release its slot
+                files = await server.files_collection.find({"incident_id": incident_ids[0]}, {"id": 1}).to_list(length=None)
+                await asyncio.gather(*(delete(file["id"]) for file in files for _ in range(2)))
+
+                mismatches = 0
+                for incident_id in incident_ids:
+                    incident = await server.incidents_collection.find_one({"id": incident_id})
+                    comments = await server.comments_collection.count_documents({"incident_id": incident_id})
+                    files = await server.files_collection.count_documents({"incident_id": incident_id})
+                    if incident.get("comments_count", 0) != comments or incident.get("files_count", 0) != files:
+                        mismatches += 1
+                    if files > server.MAX_FILES_PER_INCIDENT:
+                        mismatches += 1
+                return statuses, mismatches
+
+        statuses, mismatches = self.run_async(_stress())
+        row = {
+            "incidents": incidents,
+            "comments_ok": statuses["comment"].count(200),
+            "uploads_ok": statuses["upload"].count(200),
+            "uploads_over_limit": statuses["upload"].count(400),
+            "deletes_ok": statuses["delete"].count(200),
+            "deletes_not_found": statuses["delete"].count(404),
+            "mismatched_incidents": mismatches,
+        }
+        for key, value in row.items():
+            print(f"   {key:<22} {value}")
+
+        exact = mismatches == 0 and row["uploads_ok"] == incidents * server.MAX_FILES_PER_INCIDENT
+        print(f"{'✅' if exact else '❌'} Counters {'stay exact' if exact else 'drift'} under parallel writers")
+        self.results["counter_consistency"] = row
+        return exact
+
+    def bench_listing_encoding(self, incidents=2000, page_size=200, samples=20):
+        """Bytes on the wire and CPU per listing page for each serializer and content coding"""
+        print(f"\n🔍 Listing encoding, {page_size} incidents per page")
+        self.reset_database()
+        self.login_admin()
+        self.seed_incidents(incidents, comments_per_incident=1, files_per_incident=1)
+        url = f"/api/incidents?limit={page_size}"
+
+        rows, bodies = [], {}
+        fast_json = server.FAST_JSON_RESPONSES
+        try:
+            for serializer, enabled in (("pydantic", False), ("orjson", True)):
+                if enabled and server.orjson is None:
+                    continue
+                server.FAST_JSON_RESPONSES = enabled
+                for encoding in ("identity", "gzip", "br"):
+                    if encoding == "br" and server.brotli is None:
+                        continue
+                    headers = {"Authorization": f"Bearer {self.admin_token}", "Accept-Encoding": encoding}
+                    self.client.get(url, headers=headers)
+                    cpu, wall = [], []
+                    for _ in range(samples):
+                        cpu_start, wall_start = time.process_time(), time.perf_counter()
+                        response = self.client.get(url, headers=headers)
+                        cpu.append((time.process_time() - cpu_start) * 1000)
+                        wall.append((time.perf_counter() - wall_start) * 1000)
+                        response.raise_for_status()
+                    bodies[(serializer, encoding)] = response.json()
+                    rows.append({
+                        "serializer": serializer,
+                        "encoding": encoding,
+                        "bytes": response.num_bytes_downloaded,
+                        "cpu_ms": round(percentile(cpu, 50), 2),
+                        "p50_ms": round(percentile(wall, 50), 2),
+                    })
+                    print(f"   {serializer:<9} {encoding:<9} {rows[-1]['bytes']:>9} bytes  "
+                          f"cpu {rows[-1]['cpu_ms']:>8} ms  p50 {rows[-1]['p50_ms']:>8} ms")
+        finally:
+            server.FAST_JSON_RESPONSES = fast_json
+
+        baseline = bodies[("pydantic", "identity")]
+        identical = all(body == baseline for body in bodies.values())
+        identity_bytes = rows[0]["bytes"]
+        compressed = all(row["bytes"] < identity_bytes / 4 for row in rows if row["encoding"] != "identity")
+        print(f"{'✅' if identical else '❌'} Every serializer/coding {'returns' if identical else 'does not return'} the same listing")
+        print(f"{'✅' if compressed else '❌'} Compressed pages are {'under' if compressed else 'not under'} a quarter of the raw size")
+        self.results["listing_encoding"] = rows
+        return identical and compressed
+
+    # Load scenarios
+
+    POPULATION_PASSWORD = "benchmark123"
+
+    def seed_population(self, users=2000, incidents=100000, comments_per_incident=3, files_per_incident=1, batch_size=5000):
+        """Seed residents plus incidents (with comments and files) spread across them"""
+        print(f"\n🌱 Seeding {users} users, {incidents} incidents, "
+              f"{incidents * comments_per_incident} comments, {incidents * files_per_incident} files")
+        start = time.perf_counter()
+
+        async def _seed():
+            # One bcrypt hash shared by every resident; hashing thousands would dominate seeding
+            password_hash = await server.get_password_hash(self.POPULATION_PASSWORD)
+            now = datetime.utcnow()
+            residents = [{
+                "id": str(uuid.uuid4()),
+                "username": f"morador{i}",
+                "email": f"morador{i}@benchmark.local",
+                "password": password_hash,
+                "role": "user",
+                "created_at": now,
+            } for i in range(users)]
+            for offset in range(0, len(residents), batch_size):
+                await server.users_collection.insert_many(residents[offset:offset + batch_size])
+
+            for offset in range(0, incidents, batch_size):
+                batch, comments, files = [], [], []
+                for i in range(offset, min(offset + batch_size, incidents)):
+                    resident = residents[i % users]
+                    incident_id = str(uuid.uuid4())
+                    created_at = now - timedelta(minutes=i)
+                    incident = {
+                        "id": incident_id,
+                        "title": f"Ocorrência {i}",
+                        "description": "Barulho excessivo após as 22h no salão de festas",
+                        "type": ("barulho", "vazamento", "estacionamento", "acidente")[i % 4],
+                        "location": str(100 + i % 40),
+                        "people_involved": f"Bloco {chr(65 + i % 6)}",
+                        "severity": ("baixa", "media", "alta")[i % 3],
+                        "status": ("nova", "em_andamento", "resolvida", "cancelada")[i % 4],
+                        "created_by": resident["id"],
+                        "created_by_username": resident["username"],
+                        "created_at": created_at,
+                        "updated_at": created_at,
+                        "comments_count": comments_per_incident,
+                        "files_count": files_per_incident,
+                    }
+                    if comments_per_incident:
+                        incident["last_comment_at"] = created_at
+                    batch.append(incident)
+                    for n in range(comments_per_incident):
+                        comments.append({
+                            "id": str(uuid.uuid4()),
+                            "incident_id": incident_id,
+                            "user_id": resident["id"],
+                            "username": resident["username"],
+                            "message": f"Comentário {n}",
+                            "is_admin": False,
+                            "created_at": created_at + timedelta(seconds=n),
+                        })
+                    for _ in range(files_per_incident):
+                        file_id = str(uuid.uuid4())
+                        files.append({
+                            "id": file_id,
+                            "incident_id": incident_id,
+                            "filename": f"{file_id}_foto.jpg",
+                            "original_name": "foto.jpg",
+                            "file_type": ".jpg",
+                            "file_size": 1024,
+                            "upload_date": created_at,
+                        })
+                await server.incidents_collection.insert_many(batch)
+                if comments:
+                    await server.comments_collection.insert_many(comments)
+                if files:
+                    await server.files_collection.insert_many(files)
+            await server.rebuild_stats()
+            return residents
+
+        self.residents = self.run_async(_seed())
+        print(f"   seeded in {time.perf_counter() - start:.1f} s")
+
+    async def login_residents(self, client, count):
+        tokens = []
+        for resident in self.residents[:count]:
+            response = await client.post("/api/login", json={"username": resident["username"], "password": self.POPULATION_PASSWORD})
+            response.raise_for_status()
+            tokens.append((resident["id"], response.json()["access_token"]))
+        return tokens
+
+    async def drive(self, total, concurrency, task):
+        """Run `task(i)` for i in range(total) with at most `concurrency` in flight"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(i):
+            async with semaphore:
+                await task(i)
+
+        await asyncio.gather(*(bounded(i) for i in range(total)))
+
+    async def scenario_login_storm(self, client, recorder, requests, concurrency):
+        """Residents logging in at once; bound by the bcrypt pool"""
+        async def login(i):
+            resident = self.residents[i % len(self.residents)]
+            await recorder.request(client, "POST /api/login", "POST", "/api/login",
+                                   json={"username": resident["username"], "password": self.POPULATION_PASSWORD})
+        await self.drive(requests, concurrency, login)
+
+    async def scenario_admin_listing(self, client, recorder, requests, concurrency):
+        """Admins paging through the book, filtering by status and opening incidents"""
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+
+        async def browse(i):
+            params = {"limit": 50}
+            if i % 2:
+                params["status"] = ("nova", "em_andamento", "resolvida", "cancelada")[i % 4]
+            incidents = []
+            for _ in range(3):
+                response = await recorder.request(client, "GET /api/incidents", "GET", "/api/incidents", headers=headers, params=params)
+                incidents.extend(response.json())
+                next_cursor = response.headers.get("X-Next-Cursor")
+                if not next_cursor:
+                    break
+                params["cursor"] = next_cursor
+            await recorder.request(client, "GET /api/stats", "GET", "/api/stats", headers=headers)
+            if incidents:
+                incident_id = random.choice(incidents)["id"]
+                await recorder.request(client, "GET /api/incidents/{id}", "GET", f"/api/incidents/{incident_id}", headers=headers)
+        await self.drive(requests, concurrency, browse)
+
+    async def scenario_comment_thread(self, client, recorder, requests, concurrency, threads=5):
+        """Residents and the admin talking on a handful of hot incidents"""
+        tokens = await self.login_residents(client, threads)
+        hot = []
+        for resident_id, token in tokens:
+            incident = await server.incidents_collection.find_one({"created_by": resident_id}, {"id": 1})
+            hot.append((incident["id"], {"Authorization": f"Bearer {token}"}))
+        admin = {"Authorization": f"Bearer {self.admin_token}"}
+
+        async def talk(i):
+            incident_id, headers = hot[i % len(hot)]
+            author = admin if i % 3 == 0 else headers
+            await recorder.request(client, "POST /api/incidents/{id}/comments", "POST", f"/api/incidents/{incident_id}/comments",
+                                   headers=author, json={"message": f"Mensagem {i}"})
+            await recorder.request(client, "GET /api/incidents/{id}/comments", "GET", f"/api/incidents/{incident_id}/comments",
+                                   headers=headers, params={"limit": 50})
+            await recorder.request(client, "POST /api/incidents/{id}/read", "POST", f"/api/incidents/{incident_id}/read", headers=headers)
+        await self.drive(requests, concurrency, talk)
+
+    async def scenario_upload_burst(self, client, recorder, requests, concurrency):
+        """Attachments arriving in parallel, spread so no incident hits its file limit"""
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        per_incident = server.MAX_FILES_PER_INCIDENT - 1
+        targets = await server.incidents_collection.find({}, {"id": 1}).sort("created_at", -1).limit(requests // per_incident + 1).to_list(length=None)
+        await server.incidents_collection.update_many({"id": {"$in": [doc["id"] for doc in targets]}}, {"$set": {"files_count": 0}})
+
+        async def upload(i):
+            incident_id = targets[i // per_incident]["id"]
+            content = sample_jpeg()
+            await recorder.request(client, "POST /api/incidents/{id}/files", "POST", f"/api/incidents/{incident_id}/files",
+                                   headers=headers, files={"file": ("foto.jpg", content, "image/jpeg")})
+            await recorder.request(client, "GET /api/incidents/{id}/files", "GET", f"/api/incidents/{incident_id}/files", headers=headers)
+        await self.drive(requests, concurrency, upload)
+
+    SCENARIOS = ("login_storm", "admin_listing", "comment_thread", "upload_burst")
+
+    def run_scenarios(self, names, requests, concurrency):
+        """Drive each scenario against the seeded population; results keyed by endpoint"""
+        self.login_admin()
+        results = {}
+        for name in names:
+            print(f"\n🔍 Scenario {name}: {requests} iterations, concurrency {concurrency}")
+            scenario = getattr(self, f"scenario_{name}")
+
+            async def _run():
+                transport = httpx.ASGITransport(app=server.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+                    recorder = LoadRecorder()
+                    await scenario(client, recorder, requests, concurrency)
+                    recorder.stop()
+                    return recorder
+
+            recorder = self.run_async(_run())
+            results[name] = {"seconds": round(recorder.elapsed, 2), "endpoints": recorder.summary()}
+            print(f"   {'endpoint':<36} {'reqs':>6} {'err':>4} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+            for endpoint, row in results[name]["endpoints"].items():
+                print(f"   {endpoint:<36} {row['requests']:>6} {row['errors']:>4} {row['throughput_rps']:>8} "
+                      f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8}")
+        self.results["scenarios"] = results
+        return all(row["errors"] == 0 for result in results.values() for row in result["endpoints"].values())
+
+    def run_checks(self):
+        success = self.bench_incident_listing_round_trips()
+        success = self.bench_login_storm() and success
+        success = self.bench_unread_listing() and success
+        success = self.bench_counter_consistency() and success
+        success = self.bench_listing_encoding() and success
+        return success
+
+    def run_all(self, options):
+        self.results["meta"] = {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "mongo": "mongomock" if USE_MONGOMOCK else server.MONGO_URL,
+            "options": vars(options),
+        }
+        with TestClient(server.app) as client:
+            self.client = client
+            success = True
+            if options.scenarios:
+                self.reset_database()
+                self.seed_population(options.users, options.incidents, options.comments_per_incident, options.files_per_incident)
+                success = self.run_scenarios(options.scenarios, options.requests, options.concurrency)
+            if options.checks:
+                success = self.run_checks() and success
+            self.reset_database()
+        print("\n" + "=" * 60)
+        return success
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Endpoints whose p95 grew by more than `tolerance` (a fraction) since the baseline run"""
+    regressions = []
+    for name, scenario in results.get("scenarios", {}).items():
+        previous = baseline.get("scenarios", {}).get(name, {}).get("endpoints", {})
+        for endpoint, row in scenario["endpoints"].items():
+            before = previous.get(endpoint)
+            if before and before["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                regressions.append((name, endpoint, before["p95_ms"], row["p95_ms"]))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="VB Soluções backend load tests and benchmarks")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock-motor instead of MONGO_URL")
+    parser.add_argument("--scenarios", type=lambda value: [name for name in value.split(",") if name],
+                        default=list(VBSolucoesBenchmark.SCENARIOS),
+                        help=f"comma-separated subset of {','.join(VBSolucoesBenchmark.SCENARIOS)} (empty to skip)")
+    parser.add_argument("--no-checks", dest="checks", action="store_false", help="skip the pass/fail regression checks")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--incidents", type=int, default=100000)
+    parser.add_argument("--comments-per-incident", type=int, default=3)
+    parser.add_argument("--files-per-incident", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=500, help="iterations per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare p95 against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth over the baseline (0.2 = 20%%)")
+    options = parser.parse_args()
+    unknown = set(options.scenarios) - set(VBSolucoesBenchmark.SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return options
+
+
+def main():
+    options = parse_args()
+    benchmark = VBSolucoesBenchmark()
+    success = benchmark.run_all(options)
+
+    if options.output:
+        with open(options.output, "w") as handle:
+            json.dump(benchmark.results, handle, indent=2, default=str)
+        print(f"📝 Results written to {options.output}")
+
+    if options.baseline:
+        with open(options.baseline) as handle:
+            baseline = json.load(handle)
+        regressions = compare_with_baseline(benchmark.results, baseline, options.tolerance)
+        print(f"📊 Compared with {baseline.get('meta', {}).get('commit') or options.baseline}")
+        for name, endpoint, before, after in regressions:
+            print(f"❌ {name} {endpoint}: p95 {before} ms -> {after} ms")
+        if not regressions:
+            print("✅ No p95 regressions")
+        success = success and not regressions
+
+    return 0 if success else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,25 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './App.css';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
+const INCIDENTS_PAGE_SIZE = 20;
+const COMMENTS_PAGE_SIZE = 200;
+const STATS_REFRESH_DELAY_MS = 500;
+
+// Attachment URLs are relative (/uploads/...) on local storage and presigned absolute URLs on S3
+const fileUrl = (url) => (/^https?:\/\//.test(url) ? url : `${API_URL}${url}`);
 
 function App() {
   const [user, setUser] = useState(null);
   const [loading, setLoading] = useState(true);
   const [incidents, setIncidents] = useState([]);
+  const [incidentsCursor, setIncidentsCursor] = useState(null);
+  const [incidentsStatus, setIncidentsStatus] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [activeSearch, setActiveSearch] = useState('');
+  const [stats, setStats] = useState(null);
   const [currentView, setCurrentView] = useState('dashboard');
   const [activeTab, setActiveTab] = useState('all');
   const [selectedIncident, setSelectedIncident] = useState(null);
@@ -64,18 +76,152 @@ function App() {
 
   const loadIncidents = async (status = null) => {
     try {
-      const params = status ? { status } : {};
+      const params = { limit: INCIDENTS_PAGE_SIZE };
+      if (status) params.status = status;
       const response = await axios.get(`${API_URL}/api/incidents`, { params });
       setIncidents(response.data);
+      setIncidentsStatus(status);
+      setActiveSearch('');
+      setIncidentsCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error loading incidents:', error);
+    }
+  };
+
+  const handleSearch = async (e) => {
+    e.preventDefault();
+    const q = searchQuery.trim();
+    if (!q) {
+      await loadIncidents(incidentsStatus);
+      return;
+    }
+    try {
+      const response = await axios.get(`${API_URL}/api/incidents/search`, { params: { q, limit: INCIDENTS_PAGE_SIZE } });
+      setIncidents(response.data);
+      setActiveSearch(q);
+      setIncidentsCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error searching incidents:', error);
+    }
+  };
+
+  const loadMoreIncidents = async () => {
+    if (!incidentsCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const params = { limit: INCIDENTS_PAGE_SIZE, cursor: incidentsCursor };
+      let url = `${API_URL}/api/incidents`;
+      if (activeSearch) {
+        params.q = activeSearch;
+        url = `${API_URL}/api/incidents/search`;
+      } else if (incidentsStatus) {
+        params.status = incidentsStatus;
+      }
+      const response = await axios.get(url, { params });
+      setIncidents(prev => [...prev, ...response.data]);
+      setIncidentsCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Error loading incidents:', error);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
+  // Load the next page of incidents when the user scrolls near the bottom
+  useEffect(() => {
+    const handleScroll = () => {
+      if (window.innerHeight + window.scrollY >= document.body.offsetHeight - 200) {
+        loadMoreIncidents();
+      }
+    };
+    window.addEventListener('scroll', handleScroll);
+    return () => window.removeEventListener('scroll', handleScroll);
+  });
+
+  // Admin tab counts come from the server-side statistics rollup. They are fetched on login and
+  // refreshed after the admin creates an incident or a status_changed event arrives, not on every list update
+  const loadStats = (currentUser) => {
+    if (!currentUser || currentUser.role !== 'admin') return;
+    axios.get(`${API_URL}/api/stats`, { params: { days: 1 } })
+      .then(response => setStats(response.data))
+      .catch(error => console.error('Error loading stats:', error));
+  };
+
+  useEffect(() => {
+    loadStats(user);
+  }, [user]);
+
+  // A bulk status change arrives as one event per incident; refresh once for the whole burst
+  const statsRefreshTimer = useRef(null);
+  const scheduleStatsRefresh = (currentUser) => {
+    if (statsRefreshTimer.current) return;
+    statsRefreshTimer.current = setTimeout(() => {
+      statsRefreshTimer.current = null;
+      loadStats(currentUser);
+    }, STATS_REFRESH_DELAY_MS);
+  };
+
+  // Keep the open incident reachable from the event stream handlers
+  const selectedIncidentRef = useRef(null);
+  useEffect(() => {
+    selectedIncidentRef.current = selectedIncident;
+  }, [selectedIncident]);
+
+  // Live updates pushed by the backend instead of re-fetching
+  useEffect(() => {
+    const token = localStorage.getItem('token');
+    if (!user || !token) return;
+
+    const source = new EventSource(`${API_URL}/api/events?token=${encodeURIComponent(token)}`);
+    const isOpen = (incidentId) => selectedIncidentRef.current && selectedIncidentRef.current.id === incidentId;
+
+    source.addEventListener('comment_created', (e) => {
+      const event = JSON.parse(e.data);
+      const unread = !isOpen(event.incident_id) && event.comment.user_id !== user.id;
+      setIncidents(prev => prev.map(i => i.id === event.incident_id
+        ? {...i, comments_count: event.comments_count, has_unread_comments: i.has_unread_comments || unread}
+        : i));
+      if (isOpen(event.incident_id)) {
+        setComments(prev => prev.some(c => c.id === event.comment.id) ? prev : [...prev, event.comment]);
+        markIncidentRead(event.incident_id);
+      }
+    });
+    source.addEventListener('status_changed', (e) => {
+      const event = JSON.parse(e.data);
+      setIncidents(prev => prev.map(i => i.id === event.incident_id ? {...i, status: event.status} : i));
+      scheduleStatsRefresh(user);
+      if (isOpen(event.incident_id)) {
+        setSelectedIncident(prev => ({...prev, status: event.status}));
+      }
+    });
+    source.addEventListener('file_added', (e) => {
+      const event = JSON.parse(e.data);
+      setIncidents(prev => prev.map(i => i.id === event.incident_id ? {...i, files_count: event.files_count} : i));
+      if (isOpen(event.incident_id)) {
+        setFiles(prev => prev.some(f => f.id === event.file.id) ? prev : [event.file, ...prev]);
+      }
+    });
+
+    return () => {
+      source.close();
+      clearTimeout(statsRefreshTimer.current);
+      statsRefreshTimer.current = null;
+    };
+  }, [user]);
+
   const loadComments = async (incidentId) => {
     try {
-      const response = await axios.get(`${API_URL}/api/incidents/${incidentId}/comments`);
-      setComments(response.data);
+      // The thread is shown whole, so follow X-Next-Cursor through every page
+      let loaded = [];
+      let cursor = null;
+      do {
+        const response = await axios.get(`${API_URL}/api/incidents/${incidentId}/comments`, {
+          params: { limit: COMMENTS_PAGE_SIZE, cursor },
+        });
+        loaded = loaded.concat(response.data);
+        cursor = response.headers['x-next-cursor'] || null;
+      } while (cursor);
+      setComments(loaded);
     } catch (error) {
       console.error('Error loading comments:', error);
     }
@@ -127,6 +273,7 @@ function App() {
     delete axios.defaults.headers.common['Authorization'];
     setUser(null);
     setIncidents([]);
+    setStats(null);
     setCurrentView('dashboard');
   };
 
@@ -135,6 +282,7 @@ function App() {
     try {
       await axios.post(`${API_URL}/api/incidents`, incidentForm);
       await loadIncidents();
+      loadStats(user);
       setIncidentForm({
         title: '',
         description: '',
@@ -267,10 +415,22 @@ function App() {
     loadIncidents(statusMap[tab]);
   };
 
+  const markIncidentRead = async (incidentId) => {
+    try {
+      await axios.post(`${API_URL}/api/incidents/${incidentId}/read`);
+      setIncidents(prev => prev.map(i => i.id === incidentId ? {...i, has_unread_comments: false} : i));
+    } catch (error) {
+      console.error('Error marking incident as read:', error);
+    }
+  };
+
   const handleViewIncident = async (incident) => {
     setSelectedIncident(incident);
     await loadComments(incident.id);
     await loadFiles(incident.id);
+    if (incident.has_unread_comments) {
+      await markIncidentRead(incident.id);
+    }
   };
 
   const formatDate = (dateString) => {
@@ -298,6 +458,9 @@ function App() {
   };
 
   const getTabCount = (status) => {
+    if (stats) {
+      return status === 'all' ? stats.total : (stats.by_status[status] || 0);
+    }
     if (status === 'all') return incidents.length;
     return incidents.filter(i => i.status === status).length;
   };
@@ -549,8 +712,23 @@ function App() {
                 {user.role === 'admin' ? 'Todas as Ocorrências' : 'Minhas Ocorrências'}
               </h2>
               <p className="text-sm text-gray-600">
-                {incidents.length} ocorrência(s) encontrada(s)
+                {incidents.length}{incidentsCursor ? '+' : ''} ocorrência(s) encontrada(s)
               </p>
+              <form onSubmit={handleSearch} className="mt-4 flex space-x-2">
+                <input
+                  type="search"
+                  value={searchQuery}
+                  onChange={(e) => setSearchQuery(e.target.value)}
+                  placeholder="Buscar ocorrências e comentários..."
+                  className="flex-1 px-3 py-2 border border-gray-300 rounded-md shadow-sm focus:outline-none focus:ring-blue-500 focus:border-blue-500"
+                />
+                <button
+                  type="submit"
+                  className="bg-blue-600 text-white px-4 py-2 rounded-md hover:bg-blue-700"
+                >
+                  Buscar
+                </button>
+              </form>
             </div>
 
             {incidents.length === 0 ? (
@@ -612,6 +790,11 @@ function App() {
                                 💬 {incident.comments_count} comentário(s)
                               </span>
                             )}
+                            {incident.has_unread_comments && (
+                              <span className="inline-flex items-center px-2 py-0.5 rounded-full text-xs font-medium bg-blue-600 text-white">
+                                Novos comentários
+                              </span>
+                            )}
                             {incident.files_count > 0 && (
                               <span className="text-green-600">
                                 📎 {incident.files_count} arquivo(s)
@@ -653,6 +836,9 @@ function App() {
                     </li>
                   ))}
                 </ul>
+                {loadingMore && (
+                  <p className="text-center text-sm text-gray-500 py-4">Carregando mais ocorrências...</p>
+                )}
               </div>
             )}
           </div>
@@ -941,9 +1127,18 @@ function App() {
                     {files.map((file) => (
                       <div key={file.id} className="flex items-center justify-between p-3 border rounded-md">
                         <div className="flex items-center space-x-3">
-                          <div className="text-2xl">
-                            {file.file_type === '.pdf' ? '📄' : '🖼️'}
-                          </div>
+                          {file.thumbnails && file.thumbnails['160'] ? (
+                            <img
+                              src={fileUrl(file.thumbnails['160'])}
+                              alt={file.original_name}
+                              loading="lazy"
+                              className="h-12 w-12 object-cover rounded"
+                            />
+                          ) : (
+                            <div className="text-2xl">
+                              {file.file_type === '.pdf' ? '📄' : '🖼️'}
+                            </div>
+                          )}
                           <div>
                             <p className="text-sm font-medium text-gray-900">{file.original_name}</p>
                             <p className="text-xs text-gray-500">
@@ -953,7 +1148,7 @@ function App() {
                         </div>
                         <div className="flex items-center space-x-2">
                           <a
-                            href={`${API_URL}/uploads/${file.filename}`}
+                            href={fileUrl(file.url || `/uploads/${file.filename}`)}
                             target="_blank"
                             rel="noopener noreferrer"
                             className="text-blue-600 hover:text-blue-800 text-sm"
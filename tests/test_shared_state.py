@@ -0,0 +1,138 @@
+"""RedisSharedState against fakeredis (SHARED_STATE_URL=fakeredis://, pip install -r backend/requirements-dev.txt)"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+import server  # noqa: E402
+
+PREFIX = "vb-test:"
+
+
+def workers(count: int):
+    """States for `count` workers sharing one fake Redis server"""
+    redis_server = fakeredis.FakeServer()
+    return [server.RedisSharedState(fakeredis.FakeAsyncRedis(server=redis_server), PREFIX) for _ in range(count)]
+
+
+async def started(*states):
+    for state in states:
+        await state.start()
+    # Let the listeners subscribe before anything is published
+    await asyncio.sleep(0.1)
+
+
+async def closed(*states):
+    for state in states:
+        await state.close()
+
+
+def test_fakeredis_url_selects_redis_backend():
+    assert isinstance(server.create_shared_state("fakeredis://"), server.RedisSharedState)
+
+
+def test_token_bucket_is_shared_and_refills():
+    async def scenario():
+        a, b = workers(2)
+        waits = [await state.take_token("read:ip:1", 10.0, 2) for state in (a, b, a)]
+        # A check with cost=0 neither spends nor refills past what is there
+        peek = await b.take_token("read:ip:1", 10.0, 2, cost=0)
+        await asyncio.sleep(0.15)
+        refilled = await b.take_token("read:ip:1", 10.0, 2)
+        await closed(a, b)
+        return waits, peek, refilled
+
+    waits, peek, refilled = asyncio.run(scenario())
+
+    assert waits[:2] == [0.0, 0.0]
+    assert 0 < waits[2] <= 0.1
+    assert peek > 0
+    assert refilled == 0.0
+
+
+def test_rate_limited_response_carries_retry_after(monkeypatch):
+    state, = workers(1)
+    monkeypatch.setattr(server, "shared_state", state)
+    monkeypatch.setitem(server.RATE_LIMITS, "read", (0.25, 1))
+    client = TestClient(server.app)
+
+    first = client.get("/api/incidents")
+    second = client.get("/api/incidents")
+
+    assert first.status_code == 403
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "4"
+
+
+def test_rate_limiter_fails_open_when_shared_state_is_down(monkeypatch):
+    class Unreachable:
+        async def take_token(self, *args):
+            raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(server, "shared_state", Unreachable())
+    client = TestClient(server.app)
+
+    assert client.get("/api/incidents").status_code == 403
+
+
+def test_events_reach_subscribers_on_other_workers():
+    admin = server.User(id="u1", username="admin", email="admin@example.com", role="admin")
+    resident = server.User(id="u2", username="morador", email="morador@example.com", role="user")
+
+    async def scenario():
+        a, b = workers(2)
+        broker = server.EventBroker(server.EVENT_QUEUE_SIZE)
+        b.subscribe("events", broker.deliver)
+        admin_queue, resident_queue = broker.subscribe(admin), broker.subscribe(resident)
+        await started(a, b)
+        a.publish("events", {"type": "status_changed", "incident_id": "i1", "created_by": "u3", "data": {}})
+        event = await asyncio.wait_for(admin_queue.get(), timeout=2)
+        await closed(a, b)
+        return event, resident_queue.qsize()
+
+    event, resident_pending = asyncio.run(scenario())
+
+    assert event["incident_id"] == "i1"
+    # Residents only hear about their own incidents
+    assert resident_pending == 0
+
+
+def test_user_cache_invalidation_reaches_other_workers():
+    user = server.User(id="u1", username="morador", email="morador@example.com", role="user")
+    server.user_cache.set("morador", user)
+
+    async def scenario():
+        a, b = workers(2)
+        b.subscribe("user-cache", server.invalidate_cached_user)
+        await started(a, b)
+        a.publish("user-cache", {"user_id": "u1"})
+        for _ in range(20):
+            if server.user_cache.get("morador") is None:
+                break
+            await asyncio.sleep(0.05)
+        await closed(a, b)
+
+    asyncio.run(scenario())
+
+    assert server.user_cache.get("morador") is None
+
+
+def test_lock_is_exclusive_until_it_expires():
+    async def scenario():
+        a, b = workers(2)
+        held = [await a.acquire_lock("gc", 0.2), await b.acquire_lock("gc", 0.2), await a.acquire_lock("gc", 0.2)]
+        await asyncio.sleep(0.3)
+        after_expiry = await b.acquire_lock("gc", 0.2)
+        await closed(a, b)
+        return held, after_expiry
+
+    held, after_expiry = asyncio.run(scenario())
+
+    assert held == [True, False, False]
+    assert after_expiry is True
@@ -0,0 +1,114 @@
+"""S3Storage against moto's in-process S3 stand-in (pip install -r backend/requirements-dev.txt)"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+moto = pytest.importorskip("moto")
+import boto3
+
+BUCKET = "vb-test-uploads"
+
+AWS_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_DEFAULT_REGION": "us-east-1",
+}
+
+# Build server.py's own storage against the bucket too, then leave the environment as it was
+_saved_env = dict(os.environ)
+os.environ.update({"STORAGE_BACKEND": "s3", "S3_BUCKET": BUCKET, **AWS_ENV})
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+try:
+    import server  # noqa: E402
+finally:
+    os.environ.clear()
+    os.environ.update(_saved_env)
+
+
+@pytest.fixture(autouse=True)
+def aws_env(monkeypatch):
+    for name, value in AWS_ENV.items():
+        monkeypatch.setenv(name, value)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    with moto.mock_aws():
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        s3 = server.S3Storage(BUCKET, "uploads/", None, None)
+        s3.spool_dir = str(tmp_path)
+        yield s3
+
+
+def spool(storage, data: bytes) -> str:
+    path = storage.spool_path()
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_put_uploads_under_prefix_and_drops_spool_file(storage):
+    path = spool(storage, b"%PDF-1.4 report")
+    asyncio.run(storage.put(path, "abc.pdf"))
+
+    assert not os.path.exists(path)
+    stored = storage.client.get_object(Bucket=BUCKET, Key="uploads/abc.pdf")
+    assert stored["Body"].read() == b"%PDF-1.4 report"
+    assert stored["ContentType"] == "application/pdf"
+
+
+def test_put_switches_to_multipart_above_chunk_size(storage):
+    data = os.urandom(server.S3_MULTIPART_CHUNK_SIZE + 1024)
+    asyncio.run(storage.put(spool(storage, data), "large.jpg"))
+
+    head = storage.client.head_object(Bucket=BUCKET, Key="uploads/large.jpg")
+    assert head["ContentLength"] == len(data)
+    # Multipart ETags are "<md5 of part md5s>-<part count>"
+    assert head["ETag"].strip('"').endswith("-2")
+
+
+def test_exists_and_delete(storage):
+    asyncio.run(storage.put(spool(storage, b"x"), "thumbs/abc_160.webp"))
+
+    assert asyncio.run(storage.exists("thumbs/abc_160.webp"))
+    asyncio.run(storage.delete("thumbs/abc_160.webp"))
+    assert not asyncio.run(storage.exists("thumbs/abc_160.webp"))
+    # Deleting what is already gone is not an error
+    asyncio.run(storage.delete("thumbs/abc_160.webp"))
+
+
+def test_download_round_trip(storage, tmp_path):
+    asyncio.run(storage.put(spool(storage, b"bytes"), "abc.png"))
+    target = str(tmp_path / "copy")
+
+    asyncio.run(storage.download("abc.png", target))
+
+    with open(target, "rb") as f:
+        assert f.read() == b"bytes"
+
+
+def test_list_objects_strips_prefix_and_ignores_other_keys(storage):
+    asyncio.run(storage.put(spool(storage, b"12345"), "abc.jpg"))
+    asyncio.run(storage.put(spool(storage, b"12"), "thumbs/abc_160.webp"))
+    storage.client.put_object(Bucket=BUCKET, Key="elsewhere/other.jpg", Body=b"x")
+
+    listed = {key: size for key, mtime, size in asyncio.run(storage.list_objects())}
+
+    assert listed == {"abc.jpg": 5, "thumbs/abc_160.webp": 2}
+
+
+def test_url_is_presigned_get_with_ttl(storage):
+    url = storage.url("abc.pdf")
+
+    assert "/uploads/abc.pdf" in url
+    assert f"X-Amz-Expires={server.S3_URL_TTL_SECONDS}" in url
+    assert "X-Amz-Signature=" in url
+
+
+def test_url_signed_for_public_endpoint():
+    with moto.mock_aws():
+        s3 = server.S3Storage(BUCKET, "uploads/", "http://minio:9000", "https://files.example.test")
+        assert s3.url("abc.pdf").startswith(f"https://files.example.test/{BUCKET}/uploads/abc.pdf?")
@@ -0,0 +1,53 @@
+"""Smoke check for the multi-worker launch mode (`WEB_CONCURRENCY=2 python backend/server.py`)"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+STARTUP_TIMEOUT_SECONDS = 30
+
+
+def mongo_available() -> bool:
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+    except PyMongoError:
+        return False
+    return True
+
+
+@pytest.mark.skipif(not mongo_available(), reason=f"needs MongoDB at {MONGO_URL}")
+def test_two_workers_start_and_serve():
+    env = dict(os.environ, WEB_CONCURRENCY="2", DB_NAME="vb_solucoes_test_workers", RATE_LIMIT_ENABLED="0")
+    with tempfile.TemporaryFile("w+") as log:
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "server.py")],
+            env=env, stdout=log, stderr=subprocess.STDOUT, text=True,
+        )
+        try:
+            deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+            output = ""
+            while time.monotonic() < deadline and process.poll() is None:
+                log.seek(0)
+                output = log.read()
+                if output.count("Application startup complete.") == 2:
+                    break
+                time.sleep(0.5)
+            assert output.count("Application startup complete.") == 2, output
+            assert "Traceback" not in output, output
+
+            with urllib.request.urlopen("http://127.0.0.1:8001/api/health", timeout=5) as response:
+                assert response.status == 200
+            with urllib.request.urlopen("http://127.0.0.1:8001/api/metrics", timeout=5) as response:
+                assert b"http_requests_total" in response.read()
+        finally:
+            process.terminate()
+            process.wait(timeout=STARTUP_TIMEOUT_SECONDS)